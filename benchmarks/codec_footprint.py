@@ -0,0 +1,154 @@
+"""
+Memory footprint of the ModelBaseCache value codecs.
+
+Builds the CategoryEmissionRates cache from synthetic rows, once with the
+text codec (the original encoding) and once with the packed struct codec,
+and reports the bytes of every key the cache writes: the main hash, the
+contribution index, the rows hash read by deltas, the sorted sets and the
+markers. Payload bytes are the stored fields, members and values; Redis
+bytes are MEMORY USAGE, or the DUMP size where it is not supported. The
+decoding time of a main hash value is reported too.
+
+--values realistic stores rates rounded to 2 decimals, as they are entered;
+--values random stores full precision floats, the worst case for text.
+
+    python benchmarks/codec_footprint.py --rows 10000
+    python benchmarks/codec_footprint.py --values random
+    python benchmarks/codec_footprint.py --redis redis://localhost:6379/15
+
+Runs against a scratch Redis database, or an in-process fakeredis server
+when no --redis url is given. The database is flushed.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis_primitives import setup_django, stored_bytes  # noqa: E402
+
+
+def make_rows(count, values, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        if values == "realistic":
+            # kg CO2e per unit and share of the total, e.g. 1.53 and 0.27
+            emission_rate = round(rng.lognormvariate(0, 1.5), 2)
+            contribution = round(rng.uniform(0, 1), 2)
+        else:
+            emission_rate = rng.uniform(0, 1000)
+            contribution = rng.uniform(0, 1)
+        rows.append(
+            {
+                "category": f"category-{i}",
+                "emission_rate": emission_rate,
+                "green_house_contribution": contribution,
+            }
+        )
+    return rows
+
+
+def payload_bytes(connection, key):
+    kind = connection.type(key)
+    if kind == b"hash":
+        return sum(
+            len(field) + len(value) for field, value in connection.hgetall(key).items()
+        )
+    if kind == b"zset":
+        # members and their 8 byte scores
+        return sum(len(member) + 8 for member in connection.zrange(key, 0, -1))
+    return len(connection.get(key) or b"")
+
+
+def measure(cache, codec_class, connection):
+    cache.codec_class = codec_class
+    cache._codecs = {}
+    cache.delete_cache()
+    cache.set_cache()
+
+    sizes = {}
+    for key in sorted(connection.scan_iter(f"{cache.hash_name}*")):
+        sizes[key.decode("utf-8")] = (
+            payload_bytes(connection, key),
+            stored_bytes(connection, key),
+        )
+
+    values = list(connection.hgetall(cache.hash_name).values())
+    started = time.perf_counter()
+    for value in values:
+        cache._decode_value(value, True)
+    decode = (time.perf_counter() - started) / len(values)
+
+    cache.delete_cache()
+    return sizes, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis", help="redis url of a scratch database")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument(
+        "--values", choices=["realistic", "random"], default="realistic"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(args.redis, os.path.join(directory, "db.sqlite3"))
+        run(args)
+
+
+def run(args):
+    from django_redis import get_redis_connection
+
+    from blog.models import CategoryEmissionRates as Model
+    from redis_tut.cache import CategoryEmissionRates
+    from redis_tut.codecs import StructCodec, TextCodec
+
+    connection = get_redis_connection("default")
+    connection.flushdb()
+    Model.objects.bulk_create(Model(**row) for row in make_rows(args.rows, args.values))
+
+    codecs = {"text": TextCodec, "struct": StructCodec}
+    results = {
+        name: measure(CategoryEmissionRates, codec_class, connection)
+        for name, codec_class in codecs.items()
+    }
+
+    print(
+        f"{args.rows} rows, {args.values} values, "
+        f"{'redis' if args.redis else 'fakeredis'}, bytes per row"
+    )
+    print(f"{'key':<48}{'text':>8}{'struct':>8}{'redis text':>12}{'redis struct':>14}")
+    totals = {name: [0, 0] for name in codecs}
+    for key in results["text"][0]:
+        line = f"{key:<48}"
+        for name in codecs:
+            payload, _ = results[name][0][key]
+            totals[name][0] += payload
+            line += f"{payload / args.rows:>8.1f}"
+        for name, width in zip(codecs, (12, 14)):
+            _, in_redis = results[name][0][key]
+            totals[name][1] += in_redis
+            line += f"{in_redis / args.rows:>{width}.1f}"
+        print(line)
+
+    print(
+        f"{'total':<48}"
+        f"{totals['text'][0] / args.rows:>8.1f}"
+        f"{totals['struct'][0] / args.rows:>8.1f}"
+        f"{totals['text'][1] / args.rows:>12.1f}"
+        f"{totals['struct'][1] / args.rows:>14.1f}"
+    )
+    print(
+        f"{'decode us/value':<48}"
+        f"{results['text'][1] * 1e6:>8.2f}{results['struct'][1] * 1e6:>8.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
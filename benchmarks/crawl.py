@@ -0,0 +1,350 @@
+"""
+Throughput and latency of the NoKeyClient channel crawl.
+
+Serves the noKey `search` and `videos` endpoints from a local fake upstream
+with configurable channel size, page size, latency and error rate, then
+times `_search` (search pages -> video batches -> extraction) in each mode:
+
+    sequential  one `videos` request at a time
+    concurrent  up to --workers `videos` requests in flight
+    cached      concurrent, with a warm per video cache, and a warm response
+                cache for the search pages when --redis is given
+    streaming   `iter_video_details`, also reports time to the first video
+
+Results are written to benchmarks/results/crawl-<git revision>.json, pass
+--compare <revision> to print the change against an earlier run.
+
+    python benchmarks/crawl.py --videos 2000 --latency-ms 40
+    python benchmarks/crawl.py --error-rate 0.05 --compare 2690788
+    python benchmarks/crawl.py --redis redis://localhost:6379/15
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+sys.path.insert(0, BASE_DIR)
+
+MODES = ["sequential", "concurrent", "cached", "streaming"]
+
+
+def make_video_id(index):
+    return f"v{index:010d}"
+
+
+def make_video(index):
+    rng = random.Random(index)
+    video_id = make_video_id(index)
+    return {
+        "id": video_id,
+        "snippet": {
+            "title": f"Video {index}",
+            "publishedAt": f"2024-02-03T{index % 24:02d}:{index % 60:02d}:00Z",
+            "channelTitle": "Benchmark channel",
+            "thumbnails": {
+                "medium": {"url": f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"}
+            },
+        },
+        "contentDetails": {"duration": f"PT{rng.randint(0, 59)}M{rng.randint(0, 59)}S"},
+        "statistics": {
+            "viewCount": str(rng.randint(0, 10**7)),
+            "likeCount": str(rng.randint(0, 10**5)),
+            "commentCount": str(rng.randint(0, 10**4)),
+        },
+    }
+
+
+class FakeUpstream:
+    """
+    Local stand-in for the noKey service, counting the requests it serves.
+
+    `videos` requests fail with a 500 for `error_rate` of the batches, chosen
+    from a hash of the requested ids so every run fails the same batches.
+    """
+
+    def __init__(self, videos, page_size, latency_ms, jitter_ms, error_rate):
+        self.videos = videos
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = {"search": 0, "videos": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/noKey/"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = {key: 0 for key in self.requests}
+
+    def _count(self, name):
+        with self._lock:
+            self.requests[name] += 1
+            return self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+
+    def _fails(self, ids):
+        digest = hashlib.sha1(ids.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") / 2**32 < self.error_rate
+
+    def search(self, params):
+        offset = int(params.get("pageToken", ["0"])[0])
+        end = min(offset + self.page_size, self.videos)
+        page = {
+            "items": [
+                {"id": {"kind": "youtube#video", "videoId": make_video_id(index)}}
+                for index in range(offset, end)
+            ]
+        }
+        if end < self.videos:
+            page["nextPageToken"] = str(end)
+        return 200, page
+
+    def list_videos(self, params):
+        ids = params.get("id", [""])[0]
+        if self._fails(ids):
+            self._count("errors")
+            return 500, {"error": "injected failure"}
+        return 200, {
+            "items": [make_video(int(video_id[1:])) for video_id in ids.split(",")]
+        }
+
+    def _make_handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+                params = parse_qs(url.query)
+                if endpoint not in ("search", "videos"):
+                    self.send_error(404)
+                    return
+
+                jitter = upstream._count(endpoint)
+                time.sleep(max(0, upstream.latency_ms + jitter) / 1000)
+                if endpoint == "search":
+                    status, body = upstream.search(params)
+                else:
+                    status, body = upstream.list_videos(params)
+
+                content = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def setup_django(redis_url):
+    import django
+    from django.conf import settings
+
+    if redis_url:
+        caches = {
+            "default": {
+                "BACKEND": "django_redis.cache.RedisCache",
+                "LOCATION": redis_url,
+                "TIMEOUT": None,
+            }
+        }
+    else:
+        caches = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "OPTIONS": {"MAX_ENTRIES": 10**6},
+            }
+        }
+
+    settings.configure(
+        CACHES=caches,
+        CACHE_METRICS={"FLUSH_INTERVAL": 10, "CACHE_ALIAS": "default"},
+    )
+    django.setup()
+
+
+def make_client(mode, args, base_url):
+    from server.helper import NoKeyClient
+
+    response_cache = video_cache = None
+    if mode == "cached":
+        from server.video_cache import VideoCache
+
+        video_cache = VideoCache(namespace=f"bench:{time.time_ns()}")
+        if args.redis:
+            # ResponseCache keeps its LRU index in a Redis sorted set
+            from server.response_cache import ResponseCache
+
+            response_cache = ResponseCache(namespace=f"bench:{time.time_ns()}")
+
+    workers = 1 if mode == "sequential" else args.workers
+    client = NoKeyClient(
+        max_workers=workers, response_cache=response_cache, video_cache=video_cache
+    )
+    client.BASE_URL = base_url
+    return client
+
+
+def crawl(client, mode):
+    """
+    Return `(videos, seconds, seconds to first video)` for one crawl.
+    """
+    start = time.perf_counter()
+    first = None
+    if mode == "streaming":
+        videos = 0
+        for _ in client.iter_video_details("benchmark"):
+            if first is None:
+                first = time.perf_counter() - start
+            videos += 1
+    else:
+        result = client._search("benchmark")
+        if isinstance(result, str):
+            raise RuntimeError(result)
+        videos = len(result)
+    return videos, time.perf_counter() - start, first
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(percent / 100 * (len(values) - 1)))]
+
+
+def run_mode(mode, args, upstream):
+    client = make_client(mode, args, upstream.base_url)
+    for _ in range(args.warmup if mode != "cached" else max(args.warmup, 1)):
+        crawl(client, mode)
+
+    upstream.reset_counts()
+    runs = [crawl(client, mode) for _ in range(args.runs)]
+
+    seconds = [run[1] for run in runs]
+    firsts = [run[2] for run in runs if run[2] is not None]
+    result = {
+        "videos": runs[-1][0],
+        "p50_s": statistics.median(seconds),
+        "p95_s": percentile(seconds, 95),
+        "videos_per_s": runs[-1][0] / statistics.median(seconds),
+        "requests_per_crawl": {
+            key: value / args.runs for key, value in upstream.requests.items()
+        },
+    }
+    if firsts:
+        result["first_video_p50_s"] = statistics.median(firsts)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, previous=None):
+    print(
+        f"{'mode':<12}{'videos':>8}{'p50 s':>9}{'p95 s':>9}{'videos/s':>10}"
+        f"{'search':>8}{'videos':>8}{'errors':>8}{'first s':>9}"
+        + (f"{'vs prev':>9}" if previous else "")
+    )
+    for mode, result in results.items():
+        requests = result["requests_per_crawl"]
+        first = result.get("first_video_p50_s")
+        line = (
+            f"{mode:<12}{result['videos']:>8}{result['p50_s']:>9.3f}"
+            f"{result['p95_s']:>9.3f}{result['videos_per_s']:>10.0f}"
+            f"{requests['search']:>8.1f}{requests['videos']:>8.1f}"
+            f"{requests['errors']:>8.1f}{(f'{first:.3f}' if first else ''):>9}"
+        )
+        if previous and mode in previous:
+            change = result["p50_s"] / previous[mode]["p50_s"] - 1
+            line += f"{change:>+9.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--videos", type=int, default=1000, help="channel size")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--redis", help="redis url of a scratch database")
+    parser.add_argument("--compare", help="git revision of an earlier result")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    setup_django(args.redis)
+    # failed batches are expected with --error-rate, don't log each one
+    logging.getLogger("server.helper").setLevel(logging.ERROR)
+    upstream = FakeUpstream(
+        args.videos, args.page_size, args.latency_ms, args.jitter_ms, args.error_rate
+    ).start()
+    try:
+        results = {mode: run_mode(mode, args, upstream) for mode in args.modes}
+    finally:
+        upstream.stop()
+
+    previous = None
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"crawl-{args.compare}.json")) as f:
+            previous = json.load(f)["results"]
+
+    revision = git_revision()
+    print(
+        f"revision {revision}, {args.videos} videos, {args.page_size} per page, "
+        f"{args.latency_ms}ms latency, {args.error_rate:.0%} errors, "
+        f"{args.runs} runs"
+    )
+    print_results(results, previous)
+
+    if not args.no_save:
+        config = {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("compare", "no_save", "redis")
+        }
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"crawl-{revision}.json")
+        with open(path, "w") as f:
+            json.dump({"revision": revision, "config": config, "results": results}, f)
+        print(f"saved {os.path.relpath(path, BASE_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
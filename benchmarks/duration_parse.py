@@ -0,0 +1,127 @@
+"""
+Speed and correctness of the ISO 8601 duration parsers.
+
+Compares the shared `server.duration` parser, cold and memoized, and its
+`parse_many`, with the `timedelta_isoformat` parse that `parse_iso8601_duration`
+used before and the string splitting `_convert_duration` of the yt clients.
+
+    python benchmarks/duration_parse.py --durations 100000 --distinct 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.duration import parse_duration, parse_many  # noqa: E402
+
+CHECKS = {
+    "PT1H23M3S": (1, 23, 3),
+    "PT5M": (0, 5, 0),
+    "PT45S": (0, 0, 45),
+    "PT2H": (2, 0, 0),
+    "P1DT2H3M": (26, 3, 0),
+}
+
+
+def legacy_convert_duration(duration):
+    # the _convert_duration of yt/v1 to v5 before the shared parser
+    duration_parts = duration.split("PT")[-1].split("H")
+    hours = int(duration_parts[0]) if duration_parts[0] else 0
+    minutes = int(duration_parts[1].split("M")[0]) if len(duration_parts) > 1 else 0
+    seconds = (
+        int(duration_parts[1].split("S")[0])
+        if len(duration_parts) > 1
+        else int(duration_parts[0].split("M")[0])
+    )
+    return hours, minutes, seconds
+
+
+def make_durations(count, distinct, seed=0):
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        hours, minutes, seconds = (
+            rng.choice([0, 0, 0, 1, 2]),
+            rng.randint(0, 59),
+            rng.randint(0, 59),
+        )
+        value = "PT" + "".join(
+            f"{amount}{unit}"
+            for amount, unit in ((hours, "H"), (minutes, "M"), (seconds, "S"))
+            if amount
+        )
+        pool.append(value if value != "PT" else "P0D")
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def check():
+    print(f"{'duration':<12}{'expected':<14}{'shared':<14}{'legacy':<14}")
+    for duration, expected in CHECKS.items():
+        try:
+            legacy = legacy_convert_duration(duration)
+        except ValueError:
+            legacy = "error"
+        shared = parse_duration(duration).to_hms()
+        print(f"{duration:<12}{str(expected):<14}{str(shared):<14}{str(legacy):<14}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check()
+    durations = make_durations(args.durations, args.distinct)
+
+    def cold():
+        for duration in durations:
+            parse_duration.__wrapped__(duration)
+
+    def memoized():
+        for duration in durations:
+            parse_duration(duration)
+
+    def batch():
+        parse_many(durations)
+
+    def legacy():
+        for duration in durations:
+            try:
+                legacy_convert_duration(duration)
+            except ValueError:
+                pass
+
+    parsers = {
+        "shared, no cache": cold,
+        "shared, memoized": memoized,
+        "parse_many": batch,
+        "_convert_duration": legacy,
+    }
+    try:
+        from timedelta_isoformat import timedelta
+
+        def isoformat():
+            for duration in durations:
+                timedelta.fromisoformat(duration)
+
+        parsers["timedelta_isoformat"] = isoformat
+    except ImportError:
+        pass
+
+    memoized()
+    print(f"{args.durations} durations, {args.distinct} distinct")
+    print(f"{'parser':<22}{'ns/duration':>12}")
+    for name, run in parsers.items():
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print(f"{name:<22}{best / args.durations * 1e9:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Memory footprint of extracted videos, dicts versus VideoRecord.
+
+Extracts synthetic `videos` resources the way `get_extract_video_details`
+did before (a dict per video with string counts and a timedelta duration)
+and as `VideoRecord`s, and reports the bytes retained per video, measured
+with tracemalloc, and the extraction time.
+
+    python benchmarks/record_memory.py --videos 100000
+"""
+
+import argparse
+import gc
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawl import make_video  # noqa: E402
+from server.duration import parse_duration  # noqa: E402
+from server.records import VideoRecord  # noqa: E402
+
+
+def legacy_extract(video):
+    # the dict built per video before VideoRecord
+    snippet = video.get("snippet", {})
+    statistics = video.get("statistics", {})
+    duration = parse_duration(video.get("contentDetails", {}).get("duration", None))
+    return {
+        "id": video["id"],
+        "title": snippet.get("title", None),
+        "published_at": snippet.get("publishedAt", None),
+        "channel_title": snippet.get("channelTitle", None),
+        "thumbnail": snippet.get("thumbnails", {}).get("medium", {}).get("url", None),
+        "duration": duration.timedelta if duration is not None else None,
+        "view_count": statistics.get("viewCount", None),
+        "like_count": statistics.get("likeCount", None),
+        "comment_count": statistics.get("commentCount", None),
+    }
+
+
+def measure(extract, payload):
+    # only what outlives the raw resources counts, as in a crawl
+    gc.collect()
+    tracemalloc.start()
+    videos = pickle.loads(payload)
+    extracted = [extract(video) for video in videos]
+    del videos
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # timed separately, tracing slows allocations down
+    videos = pickle.loads(payload)
+    started = time.perf_counter()
+    for video in videos:
+        extract(video)
+    elapsed = time.perf_counter() - started
+    return extracted, retained, elapsed / len(videos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--videos", type=int, default=100000)
+    args = parser.parse_args()
+
+    # unpickled per run, so every video has its own strings as parsed from JSON
+    payload = pickle.dumps([make_video(index) for index in range(args.videos)])
+    extractors = {"dict": legacy_extract, "VideoRecord": VideoRecord.from_video}
+
+    results = {}
+    for name, extract in extractors.items():
+        extracted, retained, elapsed = measure(extract, payload)
+        results[name] = (retained, elapsed, len(pickle.dumps(extracted)))
+        del extracted
+
+    print(f"{args.videos} videos")
+    print(f"{'format':<14}{'bytes/video':>12}{'pickled/video':>15}{'us/video':>10}")
+    for name, (retained, elapsed, pickled) in results.items():
+        print(
+            f"{name:<14}{retained / args.videos:>12.0f}"
+            f"{pickled / args.videos:>15.0f}{elapsed * 1e6:>10.2f}"
+        )
+    print(f"reduction: {results['dict'][0] / results['VideoRecord'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
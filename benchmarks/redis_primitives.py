@@ -0,0 +1,276 @@
+"""
+Throughput, latency, round trips and memory of the Redis cache primitives.
+
+Measures, with --threads concurrent callers:
+
+    model_cache.get_key     ModelBaseCache.get_key, with and without local cache
+    model_cache.get_many    ModelBaseCache.get_many of --batch keys
+    model_cache.set_cache   a full ModelBaseCache rebuild
+    queryset.list           cached Post.objects.active()
+    queryset.pk             cached Post.objects.filter(pk=...)
+    api_keys.get            cache.get('api_keys')
+    api_keys.set            cache.set('api_keys', ...)
+
+and reports ops/s, p50/p99 latency, Redis round trips per operation and the
+bytes stored. Runs against a scratch Redis database, or an in-process
+fakeredis server when no --redis url is given. The database is flushed.
+
+    python benchmarks/redis_primitives.py --rows 5000 --threads 8
+    python benchmarks/redis_primitives.py --redis redis://localhost:6379/15
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+round_trips = threading.local()
+
+
+def count_round_trip():
+    round_trips.count = getattr(round_trips, "count", 0) + 1
+
+
+def get_connection_class(fake):
+    """
+    Connection class counting the commands sent to Redis by this thread, a
+    pipeline counts as one round trip.
+    """
+    if fake:
+        import fakeredis
+
+        # renamed in fakeredis 2.27, FakeConnection became a factory function
+        base = getattr(fakeredis, "FakeRedisConnection", fakeredis.FakeConnection)
+    else:
+        from redis import Connection as base
+
+    class CountingConnection(base):
+        def send_packed_command(self, command, check_health=True):
+            count_round_trip()
+            return super().send_packed_command(command, check_health)
+
+    return CountingConnection
+
+
+def setup_django(redis_url, database):
+    import django
+    from django.conf import settings
+
+    pool_kwargs = {"connection_class": get_connection_class(redis_url is None)}
+    if redis_url is None:
+        from fakeredis import FakeServer
+
+        pool_kwargs["server"] = FakeServer()
+
+    settings.configure(
+        INSTALLED_APPS=[
+            "django.contrib.contenttypes",
+            "django.contrib.auth",
+            "blog.apps.BlogConfig",
+            "gclient.apps.GclientConfig",
+        ],
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": database}
+        },
+        CACHES={
+            "default": {
+                "BACKEND": "django_redis.cache.RedisCache",
+                "LOCATION": redis_url or "redis://localhost:6379/0",
+                "TIMEOUT": None,
+                "OPTIONS": {"CONNECTION_POOL_KWARGS": pool_kwargs},
+            }
+        },
+        CACHE_METRICS={"FLUSH_INTERVAL": 10, "CACHE_ALIAS": "default"},
+        DEFAULT_AUTO_FIELD="django.db.models.BigAutoField",
+        USE_TZ=True,
+    )
+    django.setup()
+
+    from django.core.management import call_command
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def seed(rows, posts):
+    from blog.models import CategoryEmissionRates, Post
+
+    rng = random.Random(0)
+    CategoryEmissionRates.objects.bulk_create(
+        CategoryEmissionRates(
+            category=f"category-{i}",
+            emission_rate=rng.uniform(0, 1000),
+            green_house_contribution=rng.uniform(0, 1),
+        )
+        for i in range(rows)
+    )
+    Post.objects.bulk_create(
+        Post(title=f"Post {i}", content="content " * 20, is_active=i % 4 != 0)
+        for i in range(posts)
+    )
+
+
+def measure(name, operation, ops, threads):
+    """
+    Run `operation(i)` `ops` times over `threads` threads and return its
+    throughput, latency and round trips.
+    """
+    from django.db import connection
+
+    def worker(indexes):
+        latencies = []
+        round_trips.count = 0
+        for i in indexes:
+            start = time.perf_counter()
+            operation(i)
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+        return latencies, round_trips.count
+
+    chunks = [range(start, ops, threads) for start in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(worker, chunks))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    return {
+        "name": name,
+        "ops_per_s": ops / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "round_trips": sum(result[1] for result in results) / ops,
+    }
+
+
+def stored_bytes(connection, pattern):
+    """
+    MEMORY USAGE of the keys matching `pattern`, or their DUMP size where
+    MEMORY USAGE is not supported.
+    """
+    total = 0
+    for key in connection.scan_iter(pattern):
+        try:
+            total += connection.memory_usage(key, samples=0) or 0
+        except Exception:
+            total += len(connection.dump(key) or b"")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis", help="redis url of a scratch database")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--api-keys", type=int, default=20)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(args.redis, os.path.join(directory, "db.sqlite3"))
+        run(args)
+
+
+def run(args):
+    from django.core.cache import cache
+    from django_redis import get_redis_connection
+
+    from blog.models import Post, get_queryset_cache_prefix
+    from redis_tut.cache import CategoryEmissionRates
+
+    connection = get_redis_connection("default")
+    connection.flushdb()
+    seed(args.rows, args.posts)
+
+    categories = [f"category-{i}" for i in range(args.rows)]
+    post_pks = list(Post.objects.values_list("pk", flat=True))
+    api_keys = [f"AIza{i:035d}" for i in range(args.api_keys)]
+    rng = random.Random(1)
+    lookups = [rng.choice(categories) for _ in range(args.ops)]
+    batches = [rng.sample(categories, args.batch) for _ in range(args.ops // 10)]
+
+    def get_key(i):
+        CategoryEmissionRates.get_key(lookups[i])
+
+    def get_many(i):
+        CategoryEmissionRates.get_many(batches[i])
+
+    def get_active_posts(i):
+        len(Post.objects.active())
+
+    def get_post(i):
+        len(Post.objects.filter(pk=post_pks[i % len(post_pks)]))
+
+    def get_api_keys(i):
+        cache.get("api_keys")
+
+    def set_api_keys(i):
+        cache.set("api_keys", api_keys)
+
+    CategoryEmissionRates.set_cache()
+    cache.set("api_keys", api_keys)
+    # fill the queryset cache before timing the hits
+    get_active_posts(0)
+    for i in range(len(post_pks)):
+        get_post(i)
+
+    def set_cache(i):
+        CategoryEmissionRates.set_cache()
+
+    results = [measure("model_cache.set_cache", set_cache, 20, 1)]
+    CategoryEmissionRates.local_cache = False
+    results.append(measure("model_cache.get_key", get_key, args.ops, args.threads))
+    CategoryEmissionRates.local_cache = True
+    results.append(
+        measure("model_cache.get_key local", get_key, args.ops, args.threads)
+    )
+    CategoryEmissionRates.local_cache = False
+    results.append(
+        measure(
+            f"model_cache.get_many {args.batch}",
+            get_many,
+            len(batches),
+            args.threads,
+        )
+    )
+    results += [
+        measure("queryset.list", get_active_posts, args.ops // 10, args.threads),
+        measure("queryset.pk", get_post, args.ops, args.threads),
+        measure("api_keys.get", get_api_keys, args.ops, args.threads),
+        measure("api_keys.set", set_api_keys, args.ops, args.threads),
+    ]
+
+    print(
+        f"{args.rows} rows, {args.posts} posts, {args.api_keys} api keys, "
+        f"{args.threads} threads, {'redis' if args.redis else 'fakeredis'}"
+    )
+    print(f"{'operation':<28}{'ops/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'trips/op':>10}")
+    for result in results:
+        print(
+            f"{result['name']:<28}{result['ops_per_s']:>10.0f}"
+            f"{result['p50_ms']:>9.3f}{result['p99_ms']:>9.3f}"
+            f"{result['round_trips']:>10.2f}"
+        )
+
+    prefix = cache.make_key("")
+    print()
+    print(f"{'stored':<28}{'bytes':>10}")
+    for name, pattern in [
+        ("model_cache", f"{CategoryEmissionRates.hash_name}*"),
+        ("queryset", f"{prefix}{get_queryset_cache_prefix(Post)}*"),
+        ("api_keys", f"{prefix}api_keys"),
+    ]:
+        print(f"{name:<28}{stored_bytes(connection, pattern):>10}")
+
+
+if __name__ == "__main__":
+    main()
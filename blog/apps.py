@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from redis_tut import cache as model_caches
+
+        from . import signals
+
+        # invalidate cached querysets on writes that bypass CachedQuerySet
+        signals.connect_signals()
+        # apply saved and deleted rows to the ModelBaseCache hashes
+        model_caches.connect_signals()
@@ -0,0 +1,143 @@
+import concurrent.futures
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog.models import CachedModelManager
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the Redis caches after a deploy or failover: every ModelBaseCache, '
+        'the CachedModelManager querysets, the api_keys list and, optionally, '
+        'hot channels.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--channels',
+            nargs='*',
+            default=[],
+            help='Channel ids to crawl through NoKeyClient',
+        )
+        parser.add_argument(
+            '--channels-file',
+            help='File with one channel id per line to crawl through NoKeyClient',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Caches warmed at the same time',
+        )
+
+    def get_channel_ids(self, options) -> list:
+        channel_ids = list(options['channels'])
+        if options['channels_file']:
+            try:
+                with open(options['channels_file']) as f:
+                    channel_ids += [line.strip() for line in f if line.strip()]
+            except OSError as e:
+                raise CommandError(e)
+        # keep the order, drop repeats
+        return list(dict.fromkeys(channel_ids))
+
+    def get_tasks(self, channel_ids) -> list:
+        """
+        Return `(name, fn)` pairs, `fn` fills one cache and returns a short
+        description of what it loaded.
+        """
+        # imported here, both modules connect to Redis on import
+        from redis_tut.cache import cache_registry
+        from server.views import YouTubeAPIClient, channel_flight, nokey_client
+
+        tasks = []
+        for hash_name, model_cache in cache_registry.items():
+            tasks.append(
+                (
+                    hash_name,
+                    lambda model_cache=model_cache: self.warm_model_cache(model_cache),
+                )
+            )
+
+        for model in apps.get_models():
+            for manager in model._meta.managers:
+                if isinstance(manager, CachedModelManager):
+                    tasks.append(
+                        (
+                            f'{model._meta.label}.{manager.name}',
+                            lambda manager=manager: self.warm_manager(manager),
+                        )
+                    )
+
+        tasks.append(
+            (
+                YouTubeAPIClient.API_KEYS_CACHE_KEY,
+                lambda: f'{len(YouTubeAPIClient.load_api_keys())} keys',
+            )
+        )
+
+        for channel_id in channel_ids:
+            tasks.append(
+                (
+                    f'channel {channel_id}',
+                    lambda channel_id=channel_id: self.warm_channel(
+                        channel_flight, nokey_client, channel_id
+                    ),
+                )
+            )
+        return tasks
+
+    def warm_model_cache(self, model_cache) -> str:
+        return f'{len(model_cache.set_cache())} keys'
+
+    def warm_manager(self, manager) -> str:
+        rows = sum(len(queryset) for queryset in manager.get_warm_querysets())
+        return f'{rows} rows'
+
+    def warm_channel(self, channel_flight, nokey_client, channel_id) -> str:
+        data = channel_flight.do(channel_id, lambda: nokey_client._search(channel_id))
+        if isinstance(data, str):
+            raise CommandError(data)
+        return f'{len(data)} videos'
+
+    def run_task(self, fn):
+        start = time.perf_counter()
+        try:
+            result, error = fn(), None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            # the worker thread opened its own database connection
+            connection.close()
+        return result, error, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        tasks = self.get_tasks(self.get_channel_ids(options))
+        failed = 0
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(options['workers'], 1)
+        ) as executor:
+            futures = {executor.submit(self.run_task, fn): name for name, fn in tasks}
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                result, error, elapsed = future.result()
+                if error is None:
+                    self.stdout.write(f'{name}: {result} in {elapsed * 1000:.1f}ms')
+                else:
+                    failed += 1
+                    self.stderr.write(
+                        self.style.ERROR(
+                            f'{name}: failed in {elapsed * 1000:.1f}ms, {error}'
+                        )
+                    )
+
+        total = time.perf_counter() - start
+        summary = f'Warmed {len(tasks) - failed}/{len(tasks)} caches in {total:.2f}s'
+        if failed:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
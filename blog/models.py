@@ -1,7 +1,21 @@
+import functools
+import hashlib
+import uuid
 from operator import is_
 
+from django.apps import apps
 from django.core.cache import cache
-from django.db import models
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, models, transaction
+from django.db.models.lookups import Exact, In
+from django.db.models.query import (
+    FlatValuesListIterable,
+    ModelIterable,
+    ValuesIterable,
+    ValuesListIterable,
+)
+
+from server.metrics import metrics
 
 
 class PostManager(models.Manager):
@@ -21,46 +35,264 @@ class ActiveModelMixin(models.Model):
         abstract = True
 
 
-class CachedModelManager(models.Manager):
-    def get_queryset(self):
-        cache_key = f"{self.model.__name__.lower()}_qs"
-        qs = cache.get(cache_key)
-        if not qs:
-            qs = super().get_queryset()
-            cache.set(cache_key, qs)
-        return qs
+def get_queryset_cache_prefix(model) -> str:
+    return f"{model.__name__.lower()}_qs"
+
+
+ALL_ROWS = object()
+
+
+def get_generation_key(model, pk=None) -> str:
+    """
+    `<prefix>_generation` versions every cached result of the model that is
+    not a plain primary key lookup. Primary key lookups depend on
+    `<prefix>_rows`, bumped by writes that don't know which rows they touched,
+    and on one `<prefix>_row_<pk>` per row.
+    """
+    if pk is None:
+        return f"{get_queryset_cache_prefix(model)}_generation"
+    if pk is ALL_ROWS:
+        return f"{get_queryset_cache_prefix(model)}_rows"
+    return f"{get_queryset_cache_prefix(model)}_row_{pk}"
+
+
+def get_generations(keys) -> list:
+    generations = cache.get_many(keys)
+    return [generations.get(key, 0) for key in keys]
+
+
+def bump_generation(key, timeout=None):
+    # a fresh random value rather than a counter: a key that expired and
+    # comes back never repeats a generation an older result was stored under
+    cache.set(key, uuid.uuid4().hex, timeout)
+
+
+def invalidate_queryset_cache(model, pks=None, using=None):
+    """
+    Drop the cached results that can depend on the given rows of `model`, or
+    on any of its rows when `pks` is None. Old entries are never read again
+    and expire on their own.
+
+    Inside a transaction the generations are bumped once it commits, a
+    rollback leaves the cached results valid.
+    """
+    pks = None if pks is None else list(pks)
+    transaction.on_commit(lambda: bump_generations(model, pks), using=using)
+
+
+def bump_generations(model, pks=None):
+    bump_generation(get_generation_key(model))
+
+    if pks is None:
+        bump_generation(get_generation_key(model, ALL_ROWS))
+    else:
+        # one key per written row, they must outlive the results built on them
+        for pk in pks:
+            bump_generation(get_generation_key(model, pk), CachedQuerySet.cache_timeout)
+
+
+@functools.lru_cache(maxsize=None)
+def get_models_by_table() -> dict:
+    return {
+        connection.ops.quote_name(model._meta.db_table): model
+        for model in apps.get_models(include_auto_created=True)
+    }
+
+
+def is_cached_model(model) -> bool:
+    return any(
+        isinstance(manager, CachedModelManager) for manager in model._meta.managers
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_invalidated_models() -> frozenset:
+    """
+    The models whose writes invalidate cached results: every model with a
+    CachedModelManager, and the models and m2m through tables related to
+    it, whose tables can appear in its joins. `blog.signals` connects the
+    model signals for these only.
+    """
+    models = set()
+    for model in apps.get_models():
+        if not is_cached_model(model):
+            continue
+
+        models.add(model)
+        for field in model._meta.get_fields(include_hidden=True):
+            if isinstance(field.related_model, type):
+                models.add(field.related_model)
+            if field.many_to_many:
+                through = getattr(field, 'through', None) or field.remote_field.through
+                models.add(through)
+    return frozenset(models)
 
-    def create(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().create(*args, **kwargs)
 
-    def update(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().update(*args, **kwargs)
+def in_dirty_transaction(using) -> bool:
+    """
+    Whether the connection is inside a transaction that wrote rows the cache
+    is waiting on. Those rows are visible to the transaction but may still
+    be rolled back.
+    """
+    db_connection = transaction.get_connection(using)
+    return db_connection.in_atomic_block and bool(db_connection.run_on_commit)
 
-    def delete(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().delete(*args, **kwargs)
 
-    def bulk_create(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().bulk_create(*args, **kwargs)
+class CachedQuerySet(models.QuerySet):
+    """
+    QuerySet that caches its evaluated rows in Redis.
 
-    def bulk_update(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().bulk_update(*args, **kwargs)
+    Results are keyed on the compiled SQL and params plus the generations of
+    everything they depend on, and stored as plain row tuples rather than
+    pickled model instances. Primary key lookups depend on their rows only,
+    other queries on every model whose table appears in the SQL. Writes made
+    through the queryset bump the generations here, writes made anywhere
+    else through the model signals in `blog.signals`, both once the
+    transaction commits. Queries that read tables whose writes are not
+    tracked, or that run after uncommitted writes, bypass the cache.
+    """
 
-    def bulk_delete(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().bulk_delete(*args, **kwargs)
+    cache_timeout = 60 * 60
+    cacheable_iterables = (
+        ModelIterable,
+        ValuesIterable,
+        ValuesListIterable,
+        FlatValuesListIterable,
+    )
 
-    def get_or_create(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().get_or_create(*args, **kwargs)
+    def _is_cacheable(self) -> bool:
+        query = self.query
+        return (
+            self._iterable_class in self.cacheable_iterables
+            and not self._prefetch_related_lookups
+            and not query.select_related
+            and not query.select_for_update
+            and not query.annotations
+            and not query.extra
+            and query.deferred_loading == (frozenset(), True)
+        )
 
-    def update_or_create(self, *args, **kwargs):
-        cache.delete(f"{self.model.__name__.lower()}_qs")
-        return super().update_or_create(*args, **kwargs)
+    def _get_pk_lookup(self):
+        """
+        Return the primary keys when the query is a plain `pk=` or `pk__in=`
+        lookup, otherwise None.
+        """
+        where = self.query.where
+        if where.negated or len(where.children) != 1:
+            return None
+
+        lookup = where.children[0]
+        if not isinstance(lookup, (Exact, In)):
+            return None
+
+        target = getattr(lookup.lhs, 'target', None)
+        if target is None or not target.primary_key:
+            return None
+
+        values = lookup.rhs if isinstance(lookup, In) else [lookup.rhs]
+        if not isinstance(values, (list, tuple, set)) or any(
+            hasattr(value, 'resolve_expression') for value in values
+        ):
+            return None
+        return values
+
+    def _get_dependency_keys(self, sql: str) -> list:
+        """
+        Return the generation keys the result depends on, or None when it
+        reads a table whose writes are not tracked.
+        """
+        dependencies = [
+            model for table, model in get_models_by_table().items() if table in sql
+        ]
+        if not set(dependencies) <= get_invalidated_models():
+            return None
+
+        if dependencies == [self.model]:
+            pks = self._get_pk_lookup()
+            if pks is not None:
+                return [get_generation_key(self.model, ALL_ROWS)] + [
+                    get_generation_key(self.model, pk) for pk in sorted(map(str, pks))
+                ]
+
+        return [get_generation_key(model) for model in dependencies or [self.model]]
+
+    def _get_result_cache_key(self):
+        sql, params = self.query.sql_with_params()
+        dependency_keys = self._get_dependency_keys(sql)
+        if dependency_keys is None:
+            return None
+
+        generations = get_generations(dependency_keys)
+        digest = hashlib.sha1(
+            f"{self.db}:{self._iterable_class.__name__}:{sql}:{params!r}:"
+            f"{dependency_keys!r}:{generations!r}".encode('utf-8')
+        ).hexdigest()
+        return f"{get_queryset_cache_prefix(self.model)}:{digest}"
+
+    def _get_attnames(self):
+        return [field.attname for field in self.model._meta.concrete_fields]
+
+    def _fetch_rows(self) -> list:
+        if self._iterable_class is not ModelIterable:
+            return list(self._iterable_class(self))
+
+        # rows are stored as tuples of the concrete field values
+        return list(ValuesListIterable(self.values_list(*self._get_attnames())))
+
+    def _build_results(self, rows: list) -> list:
+        if self._iterable_class is not ModelIterable:
+            return rows
+
+        attnames = self._get_attnames()
+        return [self.model.from_db(self.db, attnames, row) for row in rows]
+
+    def _fetch_all(self):
+        if (
+            self._result_cache is None
+            and self._is_cacheable()
+            and not in_dirty_transaction(self.db)
+        ):
+            try:
+                cache_key = self._get_result_cache_key()
+            except EmptyResultSet:
+                cache_key = None
+
+            if cache_key is not None:
+                namespace = get_queryset_cache_prefix(self.model)
+                with metrics.timer(namespace):
+                    rows = cache.get(cache_key)
+                if rows is None:
+                    metrics.incr(namespace, 'misses')
+                    rows = self._fetch_rows()
+                    cache.set(cache_key, rows, self.cache_timeout)
+                    metrics.incr(namespace, 'sets')
+                else:
+                    metrics.incr(namespace, 'hits')
+                self._result_cache = self._build_results(rows)
+
+        super()._fetch_all()
+
+    # save() and delete() are covered by the model signals, these are the
+    # writes that don't send any
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        invalidate_queryset_cache(self.model, using=self.db)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        pks = [obj.pk for obj in objs]
+        invalidate_queryset_cache(
+            self.model, None if None in pks else pks, using=self.db
+        )
+        return objs
+
+    def bulk_update(self, objs, *args, **kwargs):
+        objs = list(objs)
+        rows = super().bulk_update(objs, *args, **kwargs)
+        invalidate_queryset_cache(self.model, [obj.pk for obj in objs], using=self.db)
+        return rows
 
     def active(self):
         return self.filter(is_active=True)
@@ -69,6 +301,17 @@ class CachedModelManager(models.Manager):
         return self.filter(is_active=False)
 
 
+class CachedModelManager(models.Manager.from_queryset(CachedQuerySet)):
+    def get_warm_querysets(self) -> list:
+        """
+        The querysets `manage.py warm_caches` evaluates to fill the cache.
+        """
+        querysets = [self.all()]
+        if any(field.name == 'is_active' for field in self.model._meta.fields):
+            querysets.append(self.active())
+        return querysets
+
+
 class Post(ActiveModelMixin, models.Model):
     title = models.CharField(max_length=100)
     content = models.TextField()
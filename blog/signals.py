@@ -0,0 +1,46 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import get_invalidated_models, invalidate_queryset_cache
+
+
+def invalidate_saved_row(sender, instance, using, **kwargs):
+    invalidate_queryset_cache(sender, [instance.pk], using=using)
+
+
+def invalidate_deleted_row(sender, instance, using, **kwargs):
+    invalidate_queryset_cache(sender, [instance.pk], using=using)
+
+
+def invalidate_m2m_rows(sender, instance, action, model, pk_set, using, **kwargs):
+    if not action.startswith('post_'):
+        return
+
+    # sender is the through model, rows on both sides may have changed
+    invalidate_queryset_cache(sender, using=using)
+    invalidate_queryset_cache(instance.__class__, [instance.pk], using=using)
+    invalidate_queryset_cache(model, list(pk_set) if pk_set else None, using=using)
+
+
+def connect_signals():
+    """
+    Connect the receivers for the models cached results can depend on only.
+    Other models keep Django's fast deletes and write no generation keys.
+    """
+    for model in get_invalidated_models():
+        label = model._meta.label_lower
+        post_save.connect(
+            invalidate_saved_row,
+            sender=model,
+            dispatch_uid=f'queryset_cache_post_save_{label}',
+        )
+        post_delete.connect(
+            invalidate_deleted_row,
+            sender=model,
+            dispatch_uid=f'queryset_cache_post_delete_{label}',
+        )
+        # only sent for the m2m through models, by add(), remove() and clear()
+        m2m_changed.connect(
+            invalidate_m2m_rows,
+            sender=model,
+            dispatch_uid=f'queryset_cache_m2m_changed_{label}',
+        )
@@ -1,3 +1,305 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.test import TransactionTestCase
+
+from gclient.models import DevKey
+from redis_tut.cache import (
+    CategoryEmissionRates as EmissionRatesCache,
+    redis_connection,
+    set_emission_rate_cache_decorator,
+)
+
+from .models import (
+    CategoryEmissionRates,
+    Post,
+    get_generation_key,
+    get_queryset_cache_prefix,
+)
+
+# the on_commit invalidation needs real commits, so every test case here is
+# a TransactionTestCase rather than a TestCase, which never commits
+
+
+def clear_queryset_cache(model):
+    cache.delete_pattern(f'{get_queryset_cache_prefix(model)}*')
+
+
+class CachedQuerySetTests(TransactionTestCase):
+    def setUp(self):
+        clear_queryset_cache(Post)
+        self.post = Post.objects.create(title='a', content='content')
+
+    def tearDown(self):
+        clear_queryset_cache(Post)
+
+    def titles(self, queryset):
+        return [post.title for post in queryset]
+
+    def test_results_are_served_from_the_cache(self):
+        self.assertEqual(self.titles(Post.objects.all()), ['a'])
+        self.assertEqual(self.titles(Post.objects.filter(pk=self.post.pk)), ['a'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(Post.objects.all()), ['a'])
+            self.assertEqual(self.titles(Post.objects.filter(pk=self.post.pk)), ['a'])
+
+    def test_save_invalidates_lists_and_the_saved_row(self):
+        other = Post.objects.create(title='b', content='content')
+        self.titles(Post.objects.all())
+        self.titles(Post.objects.filter(pk=other.pk))
+
+        self.post.title = 'changed'
+        self.post.save()
+
+        self.assertEqual(self.titles(Post.objects.order_by('pk')), ['changed', 'b'])
+        # a pk lookup of another row does not depend on the saved one
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(Post.objects.filter(pk=other.pk)), ['b'])
+
+    def test_delete_invalidates(self):
+        self.titles(Post.objects.filter(pk=self.post.pk))
+
+        self.post.delete()
+
+        self.assertEqual(self.titles(Post.objects.filter(pk=self.post.pk)), [])
+        self.assertEqual(self.titles(Post.objects.all()), [])
+
+    def test_update_invalidates_every_row(self):
+        self.titles(Post.objects.filter(pk=self.post.pk))
+
+        Post.objects.filter(pk=self.post.pk).update(title='updated')
+
+        self.assertEqual(self.titles(Post.objects.filter(pk=self.post.pk)), ['updated'])
+
+    def test_bulk_create_and_bulk_update_invalidate(self):
+        self.titles(Post.objects.all())
+
+        created = Post.objects.bulk_create([Post(title='bulk', content='content')])
+        self.assertEqual(self.titles(Post.objects.order_by('pk')), ['a', 'bulk'])
+
+        self.titles(Post.objects.filter(pk=self.post.pk))
+        self.post.title = 'bulk updated'
+        Post.objects.bulk_update([self.post], ['title'])
+        self.assertEqual(
+            self.titles(Post.objects.filter(pk=self.post.pk)), ['bulk updated']
+        )
+        self.assertEqual(len(created), 1)
+
+    def test_rolled_back_writes_never_reach_the_cache(self):
+        self.titles(Post.objects.all())
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.post.title = 'rolled back'
+                self.post.save()
+                # visible to the transaction, not cached for anyone else
+                self.assertEqual(self.titles(Post.objects.all()), ['rolled back'])
+                raise RuntimeError
+
+        self.assertEqual(self.titles(Post.objects.all()), ['a'])
+        self.assertEqual(self.titles(Post.objects.filter(pk=self.post.pk)), ['a'])
+
+    def test_committed_writes_invalidate_once_committed(self):
+        self.titles(Post.objects.all())
+
+        with transaction.atomic():
+            self.post.title = 'committed'
+            self.post.save()
+
+        self.assertEqual(self.titles(Post.objects.all()), ['committed'])
+
+    def test_row_generations_expire(self):
+        self.post.save()
+
+        key = cache.make_key(get_generation_key(Post, self.post.pk))
+        self.assertGreater(redis_connection.ttl(key), 0)
+
+    def test_signals_are_connected_for_cached_models_only(self):
+        self.assertTrue(post_delete.has_listeners(Post))
+        # other models keep Django's fast deletes
+        self.assertFalse(post_delete.has_listeners(DevKey))
+
+        CategoryEmissionRates.objects.create(
+            category='car', emission_rate=1.0, green_house_contribution=1.0
+        )
+        self.assertEqual(
+            cache.keys(f'{get_queryset_cache_prefix(CategoryEmissionRates)}*'), []
+        )
+
+
+class ModelBaseCacheTests(TransactionTestCase):
+    def setUp(self):
+        # the near cache is invalidated asynchronously, read Redis directly
+        patcher = mock.patch.object(EmissionRatesCache, 'local_cache', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clear()
+        self.addCleanup(self.clear)
+
+        self.row = CategoryEmissionRates.objects.create(
+            category='car', emission_rate=1.5, green_house_contribution=2.0
+        )
+
+    def clear(self):
+        EmissionRatesCache.delete_cache()
+        redis_connection.delete(
+            f'{EmissionRatesCache.hash_name}:debounce',
+            f'{EmissionRatesCache.hash_name}:reconciled',
+        )
+
+    def test_unknown_keys_are_negative_cached(self):
+        self.assertIsNone(EmissionRatesCache.get_key('unknown'))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(EmissionRatesCache.get_key('unknown'))
+
+    def test_deleted_hash_is_rebuilt_during_the_debounce(self):
+        # starts a rebuild and the debounce window
+        self.assertIsNone(EmissionRatesCache.get_key('unknown'))
+        EmissionRatesCache.delete_cache()
+
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+        self.assertFalse(
+            redis_connection.hexists(f'{EmissionRatesCache.hash_name}:negative', 'car')
+        )
+
+    def test_debounced_misses_are_not_negative_cached(self):
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+        redis_connection.set(f'{EmissionRatesCache.hash_name}:debounce', 1)
+        CategoryEmissionRates.objects.bulk_create(
+            [
+                CategoryEmissionRates(
+                    category='bus', emission_rate=0.5, green_house_contribution=1.0
+                )
+            ]
+        )
+
+        self.assertIsNone(EmissionRatesCache.get_key('bus'))
+        self.assertFalse(
+            redis_connection.hexists(f'{EmissionRatesCache.hash_name}:negative', 'bus')
+        )
+
+    def test_misses_on_an_empty_table_are_debounced(self):
+        CategoryEmissionRates.objects.all().delete()
+        self.clear()
+
+        # one rebuild, the other misses wait for the debounce window
+        with self.assertNumQueries(1):
+            for category in ['a', 'b', 'c', 'd', 'e']:
+                self.assertIsNone(EmissionRatesCache.get_key(category))
+
+    def test_delta_receivers_are_connected_when_the_app_is_ready(self):
+        post_save.disconnect(
+            sender=CategoryEmissionRates,
+            dispatch_uid=f'{EmissionRatesCache.hash_name}_delta_save',
+        )
+        self.assertFalse(post_save.has_listeners(CategoryEmissionRates))
+
+        apps.get_app_config('blog').ready()
+
+        self.assertTrue(post_save.has_listeners(CategoryEmissionRates))
+
+    def test_deltas_apply_to_a_table_built_empty(self):
+        CategoryEmissionRates.objects.all().delete()
+        self.clear()
+        self.assertIsNone(EmissionRatesCache.get_key('car'))
+
+        CategoryEmissionRates.objects.create(
+            category='bus', emission_rate=0.5, green_house_contribution=1.0
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(EmissionRatesCache.get_key('bus'), 0.5)
+
+    def test_save_applies_the_stored_row(self):
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+
+        self.row.emission_rate = '2.5'
+        self.row.save()
+
+        self.assertEqual(EmissionRatesCache.get_key('car'), 2.5)
+        self.assertEqual(EmissionRatesCache.top('emission_rate', 1), [('car', 2.5)])
+
+    def test_renamed_and_deleted_rows_move_in_every_index(self):
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+
+        self.row.category = 'train'
+        self.row.save()
+        self.assertEqual(EmissionRatesCache.get_key('train'), 1.5)
+        self.assertEqual(list(EmissionRatesCache.get_all()), ['train'])
+
+        self.row.delete()
+        self.assertEqual(EmissionRatesCache.get_all(), {})
+        self.assertEqual(EmissionRatesCache.top('emission_rate'), [])
+
+    def test_rolled_back_save_is_not_applied(self):
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.row.emission_rate = 9.0
+                self.row.save()
+                raise RuntimeError
+
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+
+    def test_decorated_writes_without_signals_rebuild(self):
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+
+        @set_emission_rate_cache_decorator
+        def update_rates():
+            return CategoryEmissionRates.objects.filter(category='car').update(
+                emission_rate=8.0
+            )
+
+        update_rates()
+        self.assertEqual(EmissionRatesCache.get_key('car'), 8.0)
+
+    def test_delta_waits_for_a_running_rebuild(self):
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+
+        lock = EmissionRatesCache._get_lock()
+        lock.acquire()
+        with mock.patch.object(EmissionRatesCache, 'rebuild_wait_timeout', 0.1):
+            self.row.emission_rate = 4.0
+            self.row.save()
+        # not written while the rebuild held the lock
+        self.assertEqual(EmissionRatesCache.get_key('car'), 1.5)
+        lock.release()
+
+        # the delta was dropped, the next write reconciles instead
+        self.row.emission_rate = 5.0
+        self.row.save()
+        self.assertEqual(EmissionRatesCache.get_key('car'), 5.0)
+
+    def test_top_of_nothing(self):
+        self.assertEqual(EmissionRatesCache.top('emission_rate', 0), [])
+        self.assertEqual(EmissionRatesCache.top('emission_rate', 1), [('car', 1.5)])
+
+    def test_range_by_score_pages(self):
+        CategoryEmissionRates.objects.bulk_create(
+            [
+                CategoryEmissionRates(
+                    category=category, emission_rate=rate, green_house_contribution=1.0
+                )
+                for category, rate in [('bus', 0.5), ('train', 0.1)]
+            ]
+        )
+        EmissionRatesCache.set_cache()
+
+        self.assertEqual(
+            EmissionRatesCache.range_by_score('emission_rate', count=2),
+            [('train', 0.1), ('bus', 0.5)],
+        )
+        self.assertEqual(
+            EmissionRatesCache.range_by_score('emission_rate', offset=1, desc=True),
+            [('bus', 0.5), ('train', 0.1)],
+        )
+        self.assertEqual(
+            EmissionRatesCache.range_by_score('emission_rate', 0.2, offset=0, count=1),
+            [('bus', 0.5)],
+        )
@@ -1,8 +1,7 @@
 from django.core import serializers
-from django.core.cache import cache
 from django.shortcuts import HttpResponse, redirect, render
 
-from .models import Post
+from .models import Post, invalidate_queryset_cache
 
 
 def generate_random_posts():
@@ -12,9 +11,8 @@ def generate_random_posts():
 
 
 def index(request):
-    posts = cache.get('post_qs')
-    if not posts:
-        posts = Post.objects.active()
+    # Post.objects caches the evaluated rows, keyed on the query
+    posts = Post.objects.active()
 
     context = {
         'posts': posts,
@@ -29,5 +27,6 @@ def post_create(request):
 
 
 def posts_clean(request):
-    cache.clear()
+    # only drops the cached Post results, not the whole Redis db
+    invalidate_queryset_cache(Post)
     return redirect('index')
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import DevKey
+
+# YouTube Data API quota costs in units per call
+QUOTA_COSTS = {
+    'search': 100,
+    'videos': 1,
+    'channels': 1,
+    'playlistItems': 1,
+    'commentThreads': 1,
+}
+DEFAULT_QUOTA_COST = 1
+DAILY_QUOTA = 10000
+
+# quotas reset at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+def quota_reset_at(now: Optional[datetime] = None) -> datetime:
+    now = (now or timezone.now()).astimezone(QUOTA_TIMEZONE)
+    return datetime.combine(
+        now.date() + timedelta(days=1), datetime.min.time(), tzinfo=QUOTA_TIMEZONE
+    )
+
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    return (now or timezone.now()).astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+
+class KeyPool:
+    """
+    Schedules API calls over a set of developer keys by remaining quota.
+
+    The units spent per key today are tracked in Redis so every process
+    shares the same estimate. Each call goes to the key with the most budget
+    left, and keys that hit `quotaExceeded` are skipped until the Pacific
+    midnight reset.
+    """
+
+    def __init__(
+        self,
+        api_keys: List[str],
+        daily_quota: int = DAILY_QUOTA,
+        cache_alias: str = 'default',
+    ):
+        self.api_keys = list(api_keys)
+        self.daily_quota = daily_quota
+        self.cache_alias = cache_alias
+
+    @property
+    def redis(self):
+        return get_redis_connection(self.cache_alias)
+
+    def _usage_key(self, day: str) -> str:
+        return f'quota:{day}:used'
+
+    def _exhausted_key(self, day: str) -> str:
+        return f'quota:{day}:exhausted'
+
+    def _expire_at(self, pipeline, key: str, now: datetime):
+        # keep the counters a little past the reset, then let Redis drop them
+        pipeline.expireat(key, quota_reset_at(now) + timedelta(hours=1))
+
+    def remaining(self) -> dict:
+        day = quota_day()
+        pipeline = self.redis.pipeline()
+        pipeline.hmget(self._usage_key(day), self.api_keys)
+        pipeline.smembers(self._exhausted_key(day))
+        used, exhausted = pipeline.execute() if self.api_keys else ([], set())
+        exhausted = {key.decode('utf-8') for key in exhausted}
+
+        return {
+            api_key: 0 if api_key in exhausted else self.daily_quota - int(units or 0)
+            for api_key, units in zip(self.api_keys, used)
+        }
+
+    def acquire(self, operation: str) -> str:
+        """
+        Reserve the quota of one `operation` call on the key with the most
+        budget left and return that key.
+        """
+        cost = QUOTA_COSTS.get(operation, DEFAULT_QUOTA_COST)
+        candidates = [
+            (budget, api_key)
+            for api_key, budget in self.remaining().items()
+            if budget >= cost
+        ]
+        if not candidates:
+            raise QuotaExhausted(
+                f"No API key has {cost} quota units left for {operation}"
+            )
+
+        _, api_key = max(candidates)
+
+        now = timezone.now()
+        usage_key = self._usage_key(quota_day(now))
+        pipeline = self.redis.pipeline()
+        pipeline.hincrby(usage_key, api_key, cost)
+        self._expire_at(pipeline, usage_key, now)
+        pipeline.execute()
+
+        return api_key
+
+    def mark_exhausted(self, api_key: str, reason: str = 'quotaExceeded'):
+        now = timezone.now()
+        exhausted_key = self._exhausted_key(quota_day(now))
+        pipeline = self.redis.pipeline()
+        pipeline.sadd(exhausted_key, api_key)
+        self._expire_at(pipeline, exhausted_key, now)
+        pipeline.execute()
+
+        # the key stays active, it only rests until the quota resets
+        DevKey.objects.filter(key=api_key).update(
+            reason={
+                'reason': reason,
+                'exhausted_at': now.isoformat(),
+                'resets_at': quota_reset_at(now).isoformat(),
+            }
+        )
@@ -0,0 +1,59 @@
+import functools
+import json
+import threading
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+
+@functools.lru_cache(maxsize=None)
+def get_discovery_document(service_name: str, version: str) -> dict:
+    """
+    Load and parse the discovery document once per process, from the static
+    copy shipped with google-api-python-client instead of the network.
+    """
+    content = get_static_doc(service_name, version)
+    if content is None:
+        raise ValueError(f"No static discovery document for {service_name} {version}")
+    return json.loads(content)
+
+
+class ServicePool:
+    """
+    Lazily built API service objects, one per developer key and thread.
+
+    httplib2 transports are not thread safe, so every thread gets its own
+    transport, shared by all of the services it builds.
+    """
+
+    def __init__(
+        self, service_name: str = 'youtube', version: str = 'v3', timeout: int = 30
+    ):
+        self.service_name = service_name
+        self.version = version
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _get_http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = httplib2.Http(timeout=self.timeout)
+        return http
+
+    def get(self, api_key: str):
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+
+        service = services.get(api_key)
+        if service is None:
+            service = services[api_key] = build_from_document(
+                get_discovery_document(self.service_name, self.version),
+                developerKey=api_key,
+                http=self._get_http(),
+            )
+        return service
+
+
+youtube_services = ServicePool('youtube', 'v3')
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+
+from django.test import TestCase
+
+from .models import DevKey
+from .quota import KeyPool, QuotaExhausted, quota_day, quota_reset_at
+
+API_KEYS = ['test-key-a', 'test-key-b']
+
+
+class QuotaResetTests(TestCase):
+    def test_resets_at_pacific_midnight(self):
+        # 19:00 in Los Angeles, the UTC day has already changed
+        now = datetime(2024, 1, 16, 3, 0, tzinfo=timezone.utc)
+
+        self.assertEqual(
+            quota_reset_at(now), datetime(2024, 1, 16, 8, 0, tzinfo=timezone.utc)
+        )
+        self.assertEqual(quota_day(now), '2024-01-15')
+
+    def test_resets_follow_daylight_saving_time(self):
+        now = datetime(2024, 7, 1, 12, 0, tzinfo=timezone.utc)
+
+        self.assertEqual(
+            quota_reset_at(now), datetime(2024, 7, 2, 7, 0, tzinfo=timezone.utc)
+        )
+
+
+class KeyPoolTests(TestCase):
+    def setUp(self):
+        self.pool = KeyPool(API_KEYS, daily_quota=150)
+        self.addCleanup(self.clear)
+
+    def clear(self):
+        day = quota_day()
+        self.pool.redis.hdel(self.pool._usage_key(day), *API_KEYS)
+        self.pool.redis.srem(self.pool._exhausted_key(day), *API_KEYS)
+
+    def test_calls_go_to_the_key_with_the_most_budget(self):
+        first = self.pool.acquire('search')
+        second = self.pool.acquire('search')
+
+        self.assertEqual({first, second}, set(API_KEYS))
+        self.assertEqual(self.pool.remaining(), dict.fromkeys(API_KEYS, 50))
+
+    def test_calls_that_no_key_can_afford_raise(self):
+        self.pool.acquire('search')
+        self.pool.acquire('search')
+
+        with self.assertRaises(QuotaExhausted):
+            self.pool.acquire('search')
+        # cheaper calls still fit
+        self.pool.acquire('videos')
+
+    def test_exhausted_keys_rest_until_the_reset(self):
+        dev_key = DevKey.objects.create(key='test-key-a')
+
+        self.pool.mark_exhausted('test-key-a')
+
+        self.assertEqual(self.pool.remaining()['test-key-a'], 0)
+        self.assertEqual(self.pool.acquire('videos'), 'test-key-b')
+        dev_key.refresh_from_db()
+        self.assertTrue(dev_key.is_active)
+        self.assertEqual(dev_key.reason['reason'], 'quotaExceeded')
@@ -1,7 +1,20 @@
 import importlib
+import json
+import time
+import uuid
 
 from django.conf import settings
 from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+from server.metrics import metrics
+
+from .codecs import StructCodec, TextCodec
+from .local_cache import MISSING, InvalidationListener
 
 
 def import_class_from_string(import_path):
@@ -24,7 +37,51 @@ if CACHE_KEY:
 else:
     CACHE_KEY = "default"
 redis_cache = caches[CACHE_KEY]
-redis_connection = redis_cache.get_client()
+redis_connection = get_redis_connection(CACHE_KEY)
+invalidation_listener = InvalidationListener(redis_connection)
+# every concrete ModelBaseCache subclass by hash_name, e.g. for warm up
+cache_registry = {}
+
+
+def connect_signals():
+    """
+    Connect the delta receivers of every cache in "delta" refresh mode. Called
+    from an AppConfig.ready(), so they are connected in every process and not
+    only in the ones that happen to import this module.
+    """
+    for model_cache in cache_registry.values():
+        if model_cache.refresh_mode == "delta":
+            model_cache.connect_signals()
+
+
+class CacheIndex:
+    """
+    One way of looking up the rows of a ModelBaseCache, mapping the
+    `key_params` of a row to its encoded `value_fields` like the main hash
+    does.
+    """
+
+    def __init__(self, key_params, value_fields):
+        if not (key_params and value_fields):
+            raise ValueError("CacheIndex needs key_params and value_fields")
+
+        self.key_params = key_params
+        self.value_fields = value_fields
+
+    def prepare_key(self, value):
+        key = ''
+        # separate value to by -
+        first = True
+
+        for field in self.key_params:
+            if first:
+                sep = ''
+            else:
+                sep = '-'
+            key += sep + str(value[field]).lower()
+            first = False
+
+        return key
 
 
 class ModelBaseCache:
@@ -33,13 +90,39 @@ class ModelBaseCache:
     qs_values = []
     redis_key_params = None
     redis_value_fields = []
+    # secondary lookups by name, built in the same pass over the rows as the
+    # main hash and stored at "<hash_name>:<name>"
+    indexes = {}
+    # how the value fields of a row are stored in its hash field
+    codec_class = TextCodec
+    # seconds a rebuild may hold the lock, and a concurrent miss may wait on it
+    rebuild_lock_timeout = 60
+    rebuild_wait_timeout = 10
+    # optional in-process near cache in front of the Redis hash
+    local_cache = False
+    local_cache_size = 1024
+    local_cache_ttl = 60
+    # unknown keys are answered from a negative cache for this many seconds,
+    # and misses on a built hash trigger at most one rebuild per
+    # rebuild_debounce seconds
+    negative_cache_ttl = 30
+    rebuild_debounce = 10
+    # "full" reloads the whole table after every write, "delta" applies only
+    # the saved or deleted row from the model signals and still reconciles
+    # with a full rebuild every reconcile_interval seconds
+    refresh_mode = "full"
+    reconcile_interval = 60 * 60
 
     def __new__(cls, *args, **kwargs):
         if cls is ModelBaseCache:
             raise TypeError("Cache class cannot be instantiated")
         return super().__new__(cls)
 
-    def __init_subclass__(cls, **kwargs):
+    def __init_subclass__(cls, abstract=False, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # intermediate cache types leave the validation to their subclasses
+        if abstract:
+            return
         if not hasattr(cls, "hash_name") or not cls.hash_name:
             raise ValueError("Sub Class must have hash_name attribute")
         if not hasattr(cls, "model_name") or not cls.model_name:
@@ -51,71 +134,455 @@ class ModelBaseCache:
         if not hasattr(cls, "qs_values") or not cls.qs_values:
             raise ValueError("Sub Class must have qs_values attribute")
 
+        # the main hash is the unnamed index
+        cls._indexes = {None: CacheIndex(cls.redis_key_params, cls.redis_value_fields)}
+        cls._indexes.update(cls.indexes)
+        for name, index in cls._indexes.items():
+            if not set(index.key_params + index.value_fields) <= set(cls.qs_values):
+                raise ValueError(f"Index {name!r} uses fields missing from qs_values")
+        cls._codecs = {}
+        cache_registry[cls.hash_name] = cls
+
     @classmethod
-    def get_key(cls, key, float_conversion=True):
-        key = key.lower()
-        value = redis_connection.hget(cls.hash_name, key)
-        if not value:
-            updated_cache = cls.set_cache()
-            value = updated_cache.get(key)
-
-        value = value.decode('utf-8') if isinstance(value, bytes) else value
-        # conversion is for value to be converted to float
-        if value and float_conversion:
+    def _get_index(cls, index=None):
+        try:
+            return cls._indexes[index]
+        except KeyError:
+            raise ValueError(f"{cls.__name__} has no index {index!r}") from None
+
+    @classmethod
+    def _index_name(cls, index=None):
+        if index is None:
+            return cls.hash_name
+        return f"{cls.hash_name}:{index}"
+
+    @classmethod
+    def _get_local_cache(cls):
+        if not cls.local_cache:
+            return None
+        return invalidation_listener.get_local_cache(
+            cls.hash_name, cls.local_cache_size, cls.local_cache_ttl
+        )
+
+    @classmethod
+    def get_codec(cls, index=None):
+        # built once per index, the field types come from the model
+        codec = cls._codecs.get(index)
+        if codec is None:
+            cls.model_name = import_class_from_string(cls.model_name)
+            value_fields = [
+                field
+                for field in cls.qs_values
+                if field in cls._get_index(index).value_fields
+            ]
+            codec = cls._codecs[index] = cls.codec_class.from_model(
+                cls.model_name, value_fields
+            )
+        return codec
+
+    @classmethod
+    def _decode_value(cls, value, float_conversion, index=None):
+        if value is None:
+            return None
+
+        value = cls.get_codec(index).decode(value)
+        # conversion is for text values to be converted to float
+        if value and float_conversion and isinstance(value, str):
             value = float(value)
         return value
 
     @classmethod
-    def prepare_key(cls, value):
-        key = ''
-        # separate value to by -
-        first = True
+    def get_key(cls, key, float_conversion=True, index=None):
+        with metrics.timer(cls.hash_name):
+            return cls._get_key(key, float_conversion, index)
 
-        for field in cls.redis_key_params:
-            if first:
-                sep = ''
-            else:
-                sep = '-'
-            key += sep + str(value[field].lower())
-            first = False
+    @classmethod
+    def _get_key(cls, key, float_conversion, index):
+        key = key.lower()
 
-        return key
+        local_cache = cls._get_local_cache()
+        if local_cache is not None:
+            value = local_cache.get((index, key, float_conversion))
+            if value is not MISSING:
+                metrics.incr(cls.hash_name, "hits")
+                metrics.incr(cls.hash_name, "local_hits")
+                return value
 
-    @classmethod
-    def prepare_value(cls, value):
-        if len(cls.redis_value_fields) == 1:
-            return value[cls.redis_value_fields[0]]
+        value = redis_connection.hget(cls._index_name(index), key)
+        if value:
+            metrics.incr(cls.hash_name, "hits")
         else:
-            # return dict of values
-            value_dict = {}
-            for field in cls.redis_value_fields:
-                value_dict[field] = value[field]
-            return value_dict
+            value = cls._resolve_misses([key], index).get(key)
+
+        value = cls._decode_value(value, float_conversion, index)
+        if local_cache is not None and value:
+            local_cache.set((index, key, float_conversion), value)
+        return value
+
+    @classmethod
+    def get_many(cls, keys, float_conversion=True, index=None):
+        """
+        Look up several keys at once, with a single HMGET for the ones that
+        are not in the local cache.
+        """
+        with metrics.timer(cls.hash_name):
+            return cls._get_many(keys, float_conversion, index)
+
+    @classmethod
+    def _get_many(cls, keys, float_conversion, index):
+        keys = [key.lower() for key in keys]
+        values = {}
+
+        local_cache = cls._get_local_cache()
+        if local_cache is not None:
+            for key in keys:
+                value = local_cache.get((index, key, float_conversion))
+                if value is not MISSING:
+                    values[key] = value
+            metrics.incr(cls.hash_name, "hits", len(values))
+            metrics.incr(cls.hash_name, "local_hits", len(values))
+
+        missing = [key for key in keys if key not in values]
+        if missing:
+            fetched = dict(
+                zip(missing, redis_connection.hmget(cls._index_name(index), missing))
+            )
+            misses = [key for key, value in fetched.items() if not value]
+            metrics.incr(cls.hash_name, "hits", len(missing) - len(misses))
+            if misses:
+                fetched.update(cls._resolve_misses(misses, index))
+
+            for key, value in fetched.items():
+                value = cls._decode_value(value, float_conversion, index)
+                values[key] = value
+                if local_cache is not None and value:
+                    local_cache.set((index, key, float_conversion), value)
+
+        return values
+
+    @classmethod
+    def _resolve_misses(cls, keys, index=None):
+        """
+        Look up keys missing from the hash. Keys known to be absent are not
+        looked up again until their negative entry expires, and a hash that
+        was built, even from an empty table, is rebuilt from the database at
+        most once per `rebuild_debounce`.
+        """
+        now = time.time()
+        name = cls._index_name(index)
+        negative_name = f"{name}:negative"
+
+        metrics.incr(cls.hash_name, "misses", len(keys))
+        expires = redis_connection.hmget(negative_name, keys)
+
+        unknown = [
+            key
+            for key, expires_at in zip(keys, expires)
+            if not expires_at or float(expires_at) < now
+        ]
+        metrics.incr(cls.hash_name, "negative_hits", len(keys) - len(unknown))
+        if not unknown:
+            return {}
+
+        # every rebuild starts a debounce window, but a hash that was deleted
+        # or never built holds no answer to wait for. A table with no rows
+        # builds no hash, the built marker tells it apart so misses on it are
+        # debounced too.
+        if not redis_connection.set(
+            f"{cls.hash_name}:debounce", 1, nx=True, ex=cls.rebuild_debounce
+        ) and cls._is_built(name):
+            # rebuilt moments ago, only re-read in case that rebuild added
+            # them. Not finding them here proves nothing, so nothing is
+            # remembered as absent.
+            metrics.incr(cls.hash_name, "debounced")
+            return dict(zip(unknown, redis_connection.hmget(name, unknown)))
+
+        updated_cache = cls.refresh_cache(index)
+        absent = [key for key in unknown if not updated_cache.get(key)]
+        if absent:
+            pipeline = redis_connection.pipeline()
+            pipeline.hset(
+                negative_name,
+                mapping={key: now + cls.negative_cache_ttl for key in absent},
+            )
+            pipeline.expire(negative_name, cls.negative_cache_ttl)
+            pipeline.execute()
+
+        return {key: updated_cache.get(key) for key in unknown}
+
+    @classmethod
+    def prepare_key(cls, value, index=None):
+        return cls._get_index(index).prepare_key(value)
+
+    @classmethod
+    def prepare_value(cls, value, index=None):
+        return cls.get_codec(index).encode(value)
+
+    @classmethod
+    def _built_name(cls):
+        return f"{cls.hash_name}:built"
+
+    @classmethod
+    def _is_built(cls, name):
+        return bool(redis_connection.exists(name, cls._built_name()))
 
     @classmethod
     def delete_cache(cls):
-        redis_connection.delete(cls.hash_name)
+        pipeline = redis_connection.pipeline()
+        pipeline.delete(
+            *cls._get_names(),
+            *[f"{cls._index_name(index)}:negative" for index in cls._indexes],
+            cls._built_name(),
+        )
+        invalidation_listener.publish(cls.hash_name, pipeline)
+        pipeline.execute()
 
     @classmethod
-    def set_cache(cls):
+    def _get_names(cls):
+        return [cls._rows_name()] + [cls._index_name(index) for index in cls._indexes]
+
+    @classmethod
+    def get_all(cls, index=None):
+        return {
+            key.decode('utf-8'): value
+            for key, value in redis_connection.hgetall(cls._index_name(index)).items()
+        }
+
+    @classmethod
+    def _get_lock(cls, blocking_timeout=None):
+        return redis_connection.lock(
+            f"{cls.hash_name}:rebuild",
+            timeout=cls.rebuild_lock_timeout,
+            blocking_timeout=blocking_timeout,
+        )
+
+    @classmethod
+    def _add_row(cls, mappings, value):
+        for index, cache_index in cls._indexes.items():
+            mappings[index][cache_index.prepare_key(value)] = cls.prepare_value(
+                value, index
+            )
+
+    @classmethod
+    def _dump_row(cls, value):
+        return json.dumps(
+            {field: value[field] for field in cls.qs_values}, cls=DjangoJSONEncoder
+        )
+
+    @classmethod
+    def _build_cache(cls):
+        """
+        Rebuild every index from one pass over the queryset, returning the
+        new contents by index name.
+        """
         cls.model_name = import_class_from_string(cls.model_name)
 
         # don't apply decorator on .all() that will create a recursive loop
 
-        qs_data = cls.model_name.objects.all().values(*cls.qs_values)
+        qs_data = list(cls.model_name.objects.all().values("pk", *cls.qs_values))
 
-        fulfillment_rate_dict = {
-            cls.prepare_key(value): cls.prepare_value(value) for value in qs_data
-        }
+        mappings = {index: {} for index in cls._indexes}
+        rows = {}
+        for value in qs_data:
+            cls._add_row(mappings, value)
+            rows[value["pk"]] = cls._dump_row(value)
+
+        # build the new hashes aside and swap them in, readers never see them
+        # empty or half written
+        pipeline = redis_connection.pipeline()
+        temp_name = f"{cls.hash_name}:tmp:{uuid.uuid4().hex}"
+        # pk -> row, lets a delta find where a row was stored in every index
+        targets = [(cls._rows_name(), rows)] + [
+            (cls._index_name(index), mapping) for index, mapping in mappings.items()
+        ]
+        for position, (name, mapping) in enumerate(targets):
+            if mapping:
+                pipeline.hset(f"{temp_name}:{position}", mapping=mapping)
+                pipeline.rename(f"{temp_name}:{position}", name)
+            else:
+                pipeline.delete(name)
+            # rows may have been added, forget the keys remembered as absent
+            pipeline.delete(f"{name}:negative")
+        cls._stage_build(pipeline, temp_name, qs_data)
+        pipeline.set(cls._built_name(), 1)
+        pipeline.set(f"{cls.hash_name}:reconciled", 1, ex=cls.reconcile_interval)
+        invalidation_listener.publish(cls.hash_name, pipeline)
+        pipeline.execute()
+        metrics.incr(cls.hash_name, "rebuilds")
+        metrics.incr(cls.hash_name, "sets", len(rows))
 
-        cls.delete_cache()
-        for key, value in fulfillment_rate_dict.items():
-            redis_connection.hset(cls.hash_name, key, value)
+        return mappings
 
-        return fulfillment_rate_dict
+    @classmethod
+    def _stage_build(cls, pipeline, temp_name, rows):
+        """
+        Queue extra structures built from the same rows, for cache types that
+        keep more than hashes.
+        """
+
+    @classmethod
+    def _stage_delta(cls, pipeline, old_value, value):
+        """
+        Queue the changes to those extra structures for one row.
+        """
+
+    @classmethod
+    def set_cache(cls):
+        # rebuilds run one at a time so a later one always sees the latest rows
+        with cls._get_lock(blocking_timeout=cls.rebuild_lock_timeout):
+            return cls._build_cache()[None]
+
+    @classmethod
+    def refresh_cache(cls, index=None):
+        """
+        Rebuild after a cache miss. When another caller is already rebuilding,
+        wait for it and read its result instead of rebuilding again.
+        """
+        lock = cls._get_lock()
+        if lock.acquire(blocking=False):
+            try:
+                return cls._build_cache()[index]
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    pass
+
+        if lock.acquire(blocking=True, blocking_timeout=cls.rebuild_wait_timeout):
+            lock.release()
+        return cls.get_all(index)
+
+    @classmethod
+    def _rows_name(cls):
+        return f"{cls.hash_name}:rows"
+
+    @classmethod
+    def maybe_reconcile(cls):
+        """
+        Run the periodic full rebuild that corrects any drift left by deltas.
+        """
+        if redis_connection.set(
+            f"{cls.hash_name}:reconciled", 1, nx=True, ex=cls.reconcile_interval
+        ):
+            cls.set_cache()
+            return True
+        return False
+
+    @classmethod
+    def _load_row(cls, pk):
+        row = redis_connection.hget(cls._rows_name(), pk)
+        return json.loads(row) if row else None
+
+    @classmethod
+    def _write_delta(cls, pk, old_value, value):
+        """
+        Move one row from `old_value` to `value` in every index, either side
+        is None for an inserted or deleted row.
+        """
+        pipeline = redis_connection.pipeline()
+
+        for index, cache_index in cls._indexes.items():
+            name = cls._index_name(index)
+            old_key = cache_index.prepare_key(old_value) if old_value else None
+            key = cache_index.prepare_key(value) if value else None
+
+            if old_key is not None and old_key != key:
+                pipeline.hdel(name, old_key)
+            if key is not None:
+                pipeline.hset(name, key, cls.prepare_value(value, index))
+                pipeline.hdel(f"{name}:negative", key)
+
+        cls._stage_delta(pipeline, old_value, value)
+        if value is not None:
+            pipeline.hset(cls._rows_name(), pk, cls._dump_row(value))
+        else:
+            pipeline.hdel(cls._rows_name(), pk)
+        invalidation_listener.publish(cls.hash_name, pipeline)
+        pipeline.execute()
+        metrics.incr(cls.hash_name, "sets" if value is not None else "deletes")
+
+    @classmethod
+    def _read_row(cls, pk):
+        cls.model_name = import_class_from_string(cls.model_name)
+        return cls.model_name.objects.filter(pk=pk).values("pk", *cls.qs_values).first()
+
+    @classmethod
+    def _apply_delta(cls, pk, read_value):
+        """
+        Write one row under the rebuild lock, so a rebuild that read the table
+        before the write can't rename its hashes over it afterwards.
+        """
+        try:
+            with cls._get_lock(blocking_timeout=cls.rebuild_wait_timeout):
+                if not cls._is_built(cls.hash_name):
+                    # cold, left for the next miss to build
+                    return
+                value = read_value()
+                old_value = cls._load_row(pk)
+                if old_value is not None or value is not None:
+                    cls._write_delta(pk, old_value, value)
+        except LockError:
+            # a rebuild is taking too long, have the next write reconcile
+            redis_connection.delete(f"{cls.hash_name}:reconciled")
+
+    @classmethod
+    def apply_row(cls, pk):
+        """
+        Write one saved row into every index, moving it if its keys changed.
+        The row is read back from the database as stored, not as assigned on
+        the instance.
+        """
+        if cls.maybe_reconcile():
+            return
+
+        cls._apply_delta(pk, lambda: cls._read_row(pk))
+
+    @classmethod
+    def remove_row(cls, pk):
+        if cls.maybe_reconcile():
+            return
+
+        cls._apply_delta(pk, lambda: None)
+
+    @classmethod
+    def connect_signals(cls):
+        # "blog.models.CategoryEmissionRates" -> "blog.CategoryEmissionRates",
+        # resolved lazily once the app registry is ready
+        model_path = cls.model_name
+        if isinstance(model_path, type):
+            sender = model_path
+        else:
+            module_path, model_name = model_path.rsplit(".", 1)
+            sender = f"{module_path.split('.')[0]}.{model_name}"
+
+        post_save.connect(
+            cls._on_save,
+            sender=sender,
+            weak=False,
+            dispatch_uid=f"{cls.hash_name}_delta_save",
+        )
+        post_delete.connect(
+            cls._on_delete,
+            sender=sender,
+            weak=False,
+            dispatch_uid=f"{cls.hash_name}_delta_delete",
+        )
+
+    @classmethod
+    def _on_save(cls, sender, instance, using, **kwargs):
+        # applied once the transaction is committed
+        pk = instance.pk
+        transaction.on_commit(lambda: cls.apply_row(pk), using=using)
+
+    @classmethod
+    def _on_delete(cls, sender, instance, using, **kwargs):
+        pk = instance.pk
+        transaction.on_commit(lambda: cls.remove_row(pk), using=using)
 
     @classmethod
     def set_cache_decorator(cls, func):
+        # the decorated writes are the ones that send no model signals, such
+        # as QuerySet.update() and bulk_create(), so deltas never see them
         def wrapper(*args, **kwargs):
             value = func(*args, **kwargs)
             cls.set_cache()
@@ -124,21 +591,186 @@ class ModelBaseCache:
         return wrapper
 
 
-class CategoryEmissionRates(ModelBaseCache):
+class ModelSortedSetCache(ModelBaseCache, abstract=True):
+    """
+    ModelBaseCache that also keeps one sorted set per numeric field in
+    `sorted_fields`, scored by that field with the main keys as members.
+
+    The sorted sets are built, swapped and updated by deltas together with
+    the hashes, and answer range, rank and top-K queries without touching
+    the database.
+    """
+
+    sorted_fields = []
+
+    def __init_subclass__(cls, abstract=False, **kwargs):
+        super().__init_subclass__(abstract=abstract, **kwargs)
+        if abstract:
+            return
+        if not cls.sorted_fields:
+            raise ValueError("Sub Class must have sorted_fields attribute")
+        if not set(cls.sorted_fields) <= set(cls.qs_values):
+            raise ValueError("sorted_fields must be part of qs_values")
+
+    @classmethod
+    def _sorted_name(cls, field):
+        if field not in cls.sorted_fields:
+            raise ValueError(f"{cls.__name__} has no sorted field {field!r}")
+        return f"{cls.hash_name}:by:{field}"
+
+    @classmethod
+    def _get_names(cls):
+        return super()._get_names() + [
+            cls._sorted_name(field) for field in cls.sorted_fields
+        ]
+
+    @classmethod
+    def _stage_build(cls, pipeline, temp_name, rows):
+        for field in cls.sorted_fields:
+            scores = {
+                cls.prepare_key(row): row[field]
+                for row in rows
+                if row[field] is not None
+            }
+            name = cls._sorted_name(field)
+            if scores:
+                pipeline.zadd(f"{temp_name}:by:{field}", scores)
+                pipeline.rename(f"{temp_name}:by:{field}", name)
+            else:
+                pipeline.delete(name)
+
+    @classmethod
+    def _stage_delta(cls, pipeline, old_value, value):
+        old_key = cls.prepare_key(old_value) if old_value else None
+        key = cls.prepare_key(value) if value else None
+
+        for field in cls.sorted_fields:
+            name = cls._sorted_name(field)
+            if old_key is not None and old_key != key:
+                pipeline.zrem(name, old_key)
+            if key is not None:
+                if value[field] is None:
+                    pipeline.zrem(name, key)
+                else:
+                    pipeline.zadd(name, {key: value[field]})
+
+    @classmethod
+    def _ensure_sorted(cls, name):
+        # a cold set is built once per rebuild_debounce, an empty table keeps
+        # it missing and must not rebuild on every query
+        if not redis_connection.exists(name) and redis_connection.set(
+            f"{cls.hash_name}:debounce", 1, nx=True, ex=cls.rebuild_debounce
+        ):
+            cls.refresh_cache()
+
+    @classmethod
+    def _decode_members(cls, members):
+        return [(member.decode("utf-8"), score) for member, score in members]
+
+    @classmethod
+    def range_by_score(
+        cls, field, low="-inf", high="+inf", offset=None, count=None, desc=False
+    ):
+        """
+        Return `[(key, score)]` for the rows whose `field` lies between `low`
+        and `high`, ascending unless `desc`. Pass "(" prefixed bounds for
+        exclusive ranges, as in ZRANGEBYSCORE. `offset` and `count` page the
+        result, either may be given alone.
+        """
+        # redis-py sends LIMIT only with both, a negative count is the rest
+        if offset is not None or count is not None:
+            offset = offset or 0
+            count = -1 if count is None else count
+        name = cls._sorted_name(field)
+        cls._ensure_sorted(name)
+        if desc:
+            members = redis_connection.zrevrangebyscore(
+                name, high, low, start=offset, num=count, withscores=True
+            )
+        else:
+            members = redis_connection.zrangebyscore(
+                name, low, high, start=offset, num=count, withscores=True
+            )
+        return cls._decode_members(members)
+
+    @classmethod
+    def count_by_score(cls, field, low="-inf", high="+inf"):
+        name = cls._sorted_name(field)
+        cls._ensure_sorted(name)
+        return redis_connection.zcount(name, low, high)
+
+    @classmethod
+    def rank(cls, field, key, desc=False):
+        """
+        Return the 0 based position of `key` ordered by `field`, or None.
+        """
+        name = cls._sorted_name(field)
+        cls._ensure_sorted(name)
+        if desc:
+            return redis_connection.zrevrank(name, key.lower())
+        return redis_connection.zrank(name, key.lower())
+
+    @classmethod
+    def top(cls, field, k=10, desc=True):
+        """
+        Return the `k` highest `[(key, score)]` by `field`, or lowest when
+        `desc` is False.
+        """
+        if k <= 0:
+            return []
+
+        name = cls._sorted_name(field)
+        cls._ensure_sorted(name)
+        members = redis_connection.zrange(name, 0, k - 1, desc=desc, withscores=True)
+        return cls._decode_members(members)
+
+
+class CategoryEmissionRates(ModelSortedSetCache):
     hash_name = "CategoryEmissionRates"
-    model_name = "model_cache.models.CategoryEmissionRates"
-    qs_values = ["category", "emission_rate"]
+    local_cache = True
+    model_name = "blog.models.CategoryEmissionRates"
+    qs_values = ["category", "emission_rate", "green_house_contribution"]
     redis_key_params = ["category"]
     redis_value_fields = ["emission_rate"]
+    indexes = {
+        "contribution": CacheIndex(
+            key_params=["category", "green_house_contribution"],
+            value_fields=["green_house_contribution"],
+        ),
+    }
+    sorted_fields = ["emission_rate", "green_house_contribution"]
+    codec_class = StructCodec
+    refresh_mode = "delta"
+
+
+class CategoryContributionRates:
+    """
+    Lookups by category and contribution, served by the "contribution" index
+    of CategoryEmissionRates so the table is scanned and refreshed once.
+    """
+
+    index = "contribution"
 
+    @classmethod
+    def get_key(cls, key, float_conversion=True):
+        return CategoryEmissionRates.get_key(key, float_conversion, index=cls.index)
+
+    @classmethod
+    def get_many(cls, keys, float_conversion=True):
+        return CategoryEmissionRates.get_many(keys, float_conversion, index=cls.index)
+
+    @classmethod
+    def get_all(cls):
+        return CategoryEmissionRates.get_all(cls.index)
 
-class CategoryContributionRates(ModelBaseCache):
-    hash_name = "CategoryContributionRates"
-    model_name = "model_cache.models.CategoryEmissionRates"
-    qs_values = ["category", "green_house_contribution"]
-    redis_key_params = ["category", "green_house_contribution"]
-    redis_value_fields = ["green_house_contribution"]
+    @classmethod
+    def set_cache(cls):
+        return CategoryEmissionRates.set_cache()
+
+    @classmethod
+    def delete_cache(cls):
+        CategoryEmissionRates.delete_cache()
 
 
-set_contribution_revenue_cache_decorator = CategoryContributionRates.set_cache_decorator
+set_contribution_revenue_cache_decorator = CategoryEmissionRates.set_cache_decorator
 set_emission_rate_cache_decorator = CategoryEmissionRates.set_cache_decorator
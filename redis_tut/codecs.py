@@ -0,0 +1,117 @@
+import json
+import struct
+
+# struct formats for fixed size model fields, by Django internal type
+STRUCT_FORMATS = {
+    "FloatField": "d",
+    "IntegerField": "i",
+    "SmallIntegerField": "h",
+    "PositiveIntegerField": "I",
+    "PositiveSmallIntegerField": "H",
+    "BigIntegerField": "q",
+    "PositiveBigIntegerField": "Q",
+    "AutoField": "i",
+    "BigAutoField": "q",
+    "BooleanField": "?",
+}
+# variable length fields, stored as a length prefix followed by utf-8 bytes
+STRING_TYPES = {"CharField", "TextField", "SlugField", "EmailField", "URLField"}
+
+
+class BaseCodec:
+    """
+    Encodes the value fields of one row into a single hash field value and
+    decodes it back. Rows with one value field decode to that value, rows
+    with several to a dict.
+    """
+
+    def __init__(self, fields, field_types):
+        self.fields = list(fields)
+        self.field_types = list(field_types)
+
+    @classmethod
+    def from_model(cls, model, fields):
+        return cls(
+            fields,
+            [model._meta.get_field(field).get_internal_type() for field in fields],
+        )
+
+    def encode(self, row):
+        raise NotImplementedError
+
+    def decode(self, raw):
+        raise NotImplementedError
+
+
+class TextCodec(BaseCodec):
+    """
+    Human readable encoding: a single value is stored as its text, several as
+    a JSON object. Values come back as text and are parsed by the caller.
+    """
+
+    def encode(self, row):
+        if len(self.fields) == 1:
+            return row[self.fields[0]]
+        return json.dumps({field: row[field] for field in self.fields})
+
+    def decode(self, raw):
+        raw = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        if len(self.fields) == 1 or not isinstance(raw, str):
+            return raw
+        return json.loads(raw)
+
+
+class StructCodec(BaseCodec):
+    """
+    Packed binary encoding with the layout derived from the model fields.
+
+    Fixed size fields are packed first with one precompiled `struct.Struct`,
+    string fields follow as a 2 byte length and their utf-8 bytes. Values
+    come back already typed, so reads do no string parsing.
+    """
+
+    def __init__(self, fields, field_types):
+        super().__init__(fields, field_types)
+
+        self.fixed_fields = []
+        self.string_fields = []
+        fixed_format = "<"
+        for field, field_type in zip(self.fields, self.field_types):
+            if field_type in STRUCT_FORMATS:
+                self.fixed_fields.append(field)
+                fixed_format += STRUCT_FORMATS[field_type]
+            elif field_type in STRING_TYPES:
+                self.string_fields.append(field)
+            else:
+                raise ValueError(f"StructCodec can't encode {field_type} ({field})")
+
+        self.fixed = struct.Struct(fixed_format)
+        self.length = struct.Struct("<H")
+        # a lone number, like a rate, decodes with a single unpack
+        self.single_fixed = len(self.fields) == 1 and not self.string_fields
+
+    def encode(self, row):
+        parts = [self.fixed.pack(*(row[field] for field in self.fixed_fields))]
+        for field in self.string_fields:
+            value = row[field].encode("utf-8")
+            parts.append(self.length.pack(len(value)))
+            parts.append(value)
+        return b"".join(parts)
+
+    def decode(self, raw):
+        if raw is None:
+            return None
+        if self.single_fixed:
+            return self.fixed.unpack(raw)[0]
+
+        values = dict(zip(self.fixed_fields, self.fixed.unpack_from(raw)))
+        offset = self.fixed.size
+        for field in self.string_fields:
+            (length,) = self.length.unpack_from(raw, offset)
+            offset += self.length.size
+            values[field] = raw[offset : offset + length].decode("utf-8")
+            offset += length
+
+        if len(self.fields) == 1:
+            return values[self.fields[0]]
+        return {field: values[field] for field in self.fields}
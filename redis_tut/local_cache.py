@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+INVALIDATION_CHANNEL = "model_cache:invalidate"
+
+MISSING = object()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class InvalidationListener:
+    """
+    Keeps the local caches of this process coherent with Redis.
+
+    Every rebuild or delete of a hash is published on INVALIDATION_CHANNEL,
+    and a background thread clears the matching local cache. If the
+    subscription breaks, every local cache is cleared and the listener
+    restarts on the next lookup, so stale entries are never served while it
+    is down.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.local_caches = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get_local_cache(self, hash_name, maxsize, ttl):
+        self.ensure_running()
+
+        local_cache = self.local_caches.get(hash_name)
+        if local_cache is None:
+            local_cache = self.local_caches.setdefault(
+                hash_name, LocalCache(maxsize, ttl)
+            )
+        return local_cache
+
+    def ensure_running(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self.clear_all()
+            pubsub = self.connection.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: self._handle_message})
+            self._thread = pubsub.run_in_thread(
+                sleep_time=1, daemon=True, exception_handler=self._handle_error
+            )
+
+    def publish(self, hash_name, pipeline=None):
+        local_cache = self.local_caches.get(hash_name)
+        if local_cache is not None:
+            local_cache.clear()
+        (pipeline or self.connection).publish(INVALIDATION_CHANNEL, hash_name)
+
+    def clear_all(self):
+        for local_cache in list(self.local_caches.values()):
+            local_cache.clear()
+
+    def _handle_message(self, message):
+        hash_name = message['data']
+        if isinstance(hash_name, bytes):
+            hash_name = hash_name.decode('utf-8')
+
+        local_cache = self.local_caches.get(hash_name)
+        if local_cache is not None:
+            local_cache.clear()
+
+    def _handle_error(self, error, pubsub, thread):
+        self.clear_all()
+        thread.stop()
+        pubsub.close()
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+
+Async views such as `server.views.AsyncChannelView` only run natively on the
+event loop when served through this module, e.g.:
+
+    uvicorn server.asgi:application
 """
 
 import os
@@ -0,0 +1,255 @@
+import asyncio
+import weakref
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from .columnar import VideoColumns
+from .helper import BaseNoKeyClient, BatchPlanner, BatchSize, NoKeyAPIError
+from .records import VideoRecord
+
+
+class AsyncNoKeyClient(BaseNoKeyClient):
+    """
+    asyncio counterpart of `NoKeyClient`.
+
+    All requests of an event loop share one pooled `httpx.AsyncClient`, and
+    `max_in_flight` caps the number of concurrent upstream requests across
+    every lookup running on that loop. Under ASGI that is every lookup in the
+    process; under WSGI each async view runs in a loop of its own.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        timeout: float = 30.0,
+        response_cache=None,
+        video_cache=None,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.planner = BatchPlanner()
+        self.timeout = timeout
+        self.response_cache = response_cache
+        self.video_cache = video_cache
+        # event loop -> (client, semaphore), both bind to the loop they are
+        # first used on and are dropped with it
+        self._loop_state = weakref.WeakKeyDictionary()
+
+    def _get_loop_state(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None or state[0].is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.BASE_URL,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight,
+                ),
+            )
+            state = self._loop_state[loop] = (
+                client,
+                asyncio.Semaphore(self.max_in_flight),
+            )
+        return state
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._get_loop_state()[0]
+
+    async def aclose(self):
+        state = self._loop_state.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+    async def _create_client(self, query: str, params: dict) -> Union[Dict, str]:
+        if self.response_cache is None:
+            return await self._request(query, params)
+
+        params = dict(params)
+        return await self.response_cache.aget_or_fetch(
+            query, params, lambda: self._request(query, params)
+        )
+
+    async def _request(self, query: str, params: dict) -> Union[Dict, str]:
+        client, semaphore = self._get_loop_state()
+        async with semaphore:
+            response = await client.get(query, params=params)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return f"Error in API request: {response.status_code} {response.text}"
+
+    async def _search(self, channel_id: str) -> Union[List[VideoRecord], str]:
+        videos = await self._search_videos(channel_id)
+        if isinstance(videos, str):
+            return videos
+        return self.get_extract_video_details(videos)
+
+    async def get_video_columns(self, channel_id: str) -> Union[VideoColumns, str]:
+        videos = await self._search_videos(channel_id)
+        if isinstance(videos, str):
+            return videos
+        return VideoColumns.from_videos(videos)
+
+    async def _search_videos(self, channel_id: str) -> Union[List[Dict], str]:
+        query = 'search'
+        params = self._search_params(channel_id)
+
+        try:
+            items = await self._get_all_items(query, params)
+            if isinstance(items, str):
+                return items
+
+            video_ids = self._get_video_ids(items)
+            return await self._get_videos_by_id(video_ids)
+
+        except httpx.HTTPError as e:
+            return f"Error in API request: {str(e)}"
+        except KeyError as ke:
+            return f"KeyError: {str(ke)}"
+
+    async def _iter_items(self, url: str, params: dict) -> AsyncIterator[Dict]:
+        next_page_token = None
+
+        while True:
+            if next_page_token:
+                params['pageToken'] = next_page_token
+
+            try:
+                response = await self._create_client(url, params)
+            except httpx.HTTPError as e:
+                raise NoKeyAPIError(f"Error in API request: {str(e)}") from e
+
+            if isinstance(response, str):
+                raise NoKeyAPIError(response)
+
+            items = response.get('items', [])
+            next_page_token = response.get('nextPageToken', None)
+
+            if not items:
+                break
+
+            for item in items:
+                yield item
+
+            if not next_page_token:
+                break
+
+    async def _get_all_items(self, url: str, params: dict) -> List[Dict]:
+        try:
+            return [item async for item in self._iter_items(url, params)]
+        except NoKeyAPIError as e:
+            return str(e)
+
+    async def iter_video_details(self, channel_id: str) -> AsyncIterator[VideoRecord]:
+        """
+        Streaming counterpart of `_search`, see `NoKeyClient.iter_video_details`.
+        """
+        query = 'search'
+        params = self._search_params(channel_id)
+
+        batch_size = self.planner.new_batch_size()
+        pending = deque()
+        batch = []
+
+        try:
+            async for item in self._iter_items(query, params):
+                video_id = item.get('id', {}).get('videoId', None)
+                if not video_id:
+                    continue
+
+                batch.append(video_id)
+                if len(batch) >= batch_size.value:
+                    pending.append(
+                        asyncio.create_task(
+                            self._get_video_details_by_id(batch, batch_size)
+                        )
+                    )
+                    batch = []
+
+                while pending and (
+                    pending[0].done() or len(pending) >= self.max_in_flight
+                ):
+                    for video in self._batch_result(await pending.popleft()):
+                        yield video
+
+            if batch:
+                pending.append(
+                    asyncio.create_task(
+                        self._get_video_details_by_id(batch, batch_size)
+                    )
+                )
+
+            while pending:
+                for video in self._batch_result(await pending.popleft()):
+                    yield video
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _fetch_batch(self, batch: List[str]) -> Union[Dict, str]:
+        query = 'videos'
+        params = self._videos_params(batch)
+
+        try:
+            return await self._create_client(query, params)
+        except httpx.HTTPError as e:
+            return f"Error in API request: {str(e)}"
+
+    async def _fetch_batches(self, batches: List[List[str]]) -> List[Union[Dict, str]]:
+        return await asyncio.gather(*(self._fetch_batch(batch) for batch in batches))
+
+    async def _get_video_details_by_id(
+        self, video_ids: List[str], batch_size: Optional[BatchSize] = None
+    ) -> Union[List[VideoRecord], str]:
+        videos = await self._get_videos_by_id(video_ids, batch_size)
+        if isinstance(videos, str):
+            return videos
+        return self.get_extract_video_details(videos)
+
+    async def _get_videos_by_id(
+        self, video_ids: List[str], batch_size: Optional[BatchSize] = None
+    ) -> Union[List[Dict], str]:
+        video_details = []
+        errors = []
+        batch_size = batch_size or self.planner.new_batch_size()
+
+        cached = {}
+        if self.video_cache:
+            # Redis only, run on the executor rather than the single thread
+            # that thread sensitive calls share
+            cached = await sync_to_async(
+                self.video_cache.get_many, thread_sensitive=False
+            )(video_ids)
+        missing = [video_id for video_id in video_ids if video_id not in cached]
+
+        batches = self.planner.plan(missing, batch_size)
+        retry_batches = self._collect_batches(
+            batches,
+            await self._fetch_batches(batches),
+            video_details,
+            errors,
+            batch_size,
+        )
+        self._collect_batches(
+            retry_batches,
+            await self._fetch_batches(retry_batches),
+            video_details,
+            errors,
+            batch_size,
+            retry=False,
+        )
+
+        if errors and not video_details and not cached:
+            return errors[0]
+
+        if self.video_cache:
+            await sync_to_async(self.video_cache.set_many, thread_sensitive=False)(
+                video_details
+            )
+
+        return self._merge_videos(video_ids, cached, video_details)
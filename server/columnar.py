@@ -0,0 +1,168 @@
+import heapq
+import math
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from .duration import parse_many
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# stored in the typed columns when the API leaves a value out, e.g. hidden
+# like counts. Aggregates skip it.
+MISSING = -1
+
+COUNT_COLUMNS = ('view_count', 'like_count', 'comment_count')
+NUMERIC_COLUMNS = COUNT_COLUMNS + ('duration', 'published_at')
+
+
+def parse_count(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def parse_published_at(value) -> int:
+    # 2024-02-03T01:01:00Z, fromisoformat only accepts the Z from 3.11 on
+    try:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except (AttributeError, ValueError):
+        return MISSING
+
+
+class VideoColumns:
+    """
+    Videos stored column by column, for analytics over large crawls.
+
+    Counts and `published_at` (epoch seconds) are int64 arrays, `duration` is
+    a float64 array of seconds, so numbers are converted once while filling
+    the columns and never per aggregate. `to_numpy` hands out the same data
+    as NumPy arrays, with `published_at` as datetime64, when NumPy is
+    installed; the aggregates work without it.
+    """
+
+    def __init__(self):
+        self.id: List[str] = []
+        self.title: List[Optional[str]] = []
+        self.channel_title: List[Optional[str]] = []
+        self.thumbnail: List[Optional[str]] = []
+        self.view_count = array('q')
+        self.like_count = array('q')
+        self.comment_count = array('q')
+        self.duration = array('d')
+        self.published_at = array('q')
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @classmethod
+    def from_videos(cls, videos: Iterable[Dict]) -> 'VideoColumns':
+        """
+        Fill the columns from `videos` resources in one pass.
+        """
+        columns = cls()
+        durations = []
+
+        for video in videos:
+            video_id = video.get('id', None)
+            if not video_id:
+                continue
+
+            snippet = video.get('snippet', {})
+            statistics = video.get('statistics', {})
+            columns.id.append(video_id)
+            columns.title.append(snippet.get('title', None))
+            columns.channel_title.append(snippet.get('channelTitle', None))
+            columns.thumbnail.append(
+                snippet.get('thumbnails', {}).get('medium', {}).get('url', None)
+            )
+            columns.view_count.append(parse_count(statistics.get('viewCount')))
+            columns.like_count.append(parse_count(statistics.get('likeCount')))
+            columns.comment_count.append(parse_count(statistics.get('commentCount')))
+            columns.published_at.append(parse_published_at(snippet.get('publishedAt')))
+            durations.append(video.get('contentDetails', {}).get('duration', None))
+
+        columns.duration.extend(
+            duration.seconds if duration is not None else MISSING
+            for duration in parse_many(durations)
+        )
+        return columns
+
+    def _get_column(self, name: str) -> array:
+        if name not in NUMERIC_COLUMNS:
+            raise ValueError(f'{name} is not a numeric column')
+        return getattr(self, name)
+
+    def _present(self, name: str) -> List:
+        return [value for value in self._get_column(name) if value != MISSING]
+
+    def to_numpy(self) -> Dict[str, 'numpy.ndarray']:
+        if numpy is None:
+            raise ImportError('VideoColumns.to_numpy requires numpy')
+
+        columns = {
+            name: numpy.frombuffer(self._get_column(name), dtype=dtype)
+            for name, dtype in (
+                ('view_count', numpy.int64),
+                ('like_count', numpy.int64),
+                ('comment_count', numpy.int64),
+                ('duration', numpy.float64),
+            )
+        }
+        published_at = numpy.frombuffer(self.published_at, dtype=numpy.int64)
+        columns['published_at'] = published_at.astype('datetime64[s]')
+        columns['published_at'][published_at == MISSING] = numpy.datetime64('NaT')
+        return columns
+
+    def total(self, name: str):
+        return sum(self._present(name))
+
+    def mean(self, name: str) -> Optional[float]:
+        values = self._present(name)
+        return sum(values) / len(values) if values else None
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        """
+        The `q`th percentile of a column, interpolated linearly like
+        `numpy.percentile`.
+        """
+        if numpy is not None:
+            values = numpy.frombuffer(self._get_column(name), dtype=self._dtype(name))
+            values = values[values != MISSING]
+            return float(numpy.percentile(values, q)) if len(values) else None
+
+        values = sorted(self._present(name))
+        if not values:
+            return None
+
+        position = (len(values) - 1) * q / 100
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    def top(self, name: str, n: int = 10) -> List[Dict]:
+        """
+        The `n` videos with the highest `name`, as `{'id', 'title', name}`.
+        """
+        column = self._get_column(name)
+        if n <= 0:
+            return []
+        if numpy is not None and len(column) > n:
+            values = numpy.frombuffer(column, dtype=self._dtype(name))
+            candidates = numpy.argpartition(values, -n)[-n:]
+            indexes = sorted(candidates.tolist(), key=column.__getitem__, reverse=True)
+        else:
+            indexes = heapq.nlargest(n, range(len(column)), key=column.__getitem__)
+
+        return [
+            {'id': self.id[index], 'title': self.title[index], name: column[index]}
+            for index in indexes
+            if column[index] != MISSING
+        ]
+
+    def _dtype(self, name: str):
+        return numpy.float64 if name == 'duration' else numpy.int64
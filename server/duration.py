@@ -0,0 +1,68 @@
+import datetime
+import functools
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# durations as the YouTube API sends them, e.g. PT1H2M3S, PT45S, P1DT2H or
+# P0D for live streams. Years and months have no fixed length, so they are
+# not accepted.
+DURATION_RE = re.compile(
+    r'P(?:(\d+)W)?(?:(\d+)D)?(?:T(?=\d)(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?'
+)
+
+# a channel has few distinct durations, the cache keeps parsing to a lookup
+DURATION_CACHE_SIZE = 4096
+
+
+class Duration(NamedTuple):
+    seconds: float
+    timedelta: datetime.timedelta
+
+    def to_hms(self) -> Tuple[int, int, int]:
+        minutes, seconds = divmod(int(self.seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return hours, minutes, seconds
+
+
+@functools.lru_cache(maxsize=DURATION_CACHE_SIZE)
+def parse_duration(value: str) -> Optional[Duration]:
+    """
+    Parse an ISO 8601 duration, returning None when it is missing or not a
+    duration the API sends.
+    """
+    if not isinstance(value, str):
+        return None
+
+    match = DURATION_RE.fullmatch(value)
+    if match is None or value == 'P':
+        return None
+
+    weeks, days, hours, minutes, seconds = match.groups()
+    total = (
+        int(weeks or 0) * 604800
+        + int(days or 0) * 86400
+        + int(hours or 0) * 3600
+        + int(minutes or 0) * 60
+    )
+    if seconds:
+        total += float(seconds) if '.' in seconds else int(seconds)
+
+    return Duration(total, datetime.timedelta(seconds=total))
+
+
+def parse_many(values: Iterable[str]) -> List[Optional[Duration]]:
+    """
+    Parse a batch of durations, each distinct string only once.
+    """
+    parsed = {}
+    results = []
+    for value in values:
+        try:
+            duration = parsed[value]
+        except KeyError:
+            duration = parsed[value] = parse_duration(value)
+        except TypeError:
+            # unhashable, never a duration
+            duration = None
+        results.append(duration)
+    return results
@@ -1,32 +1,240 @@
-from typing import Dict, List, Union
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Union
 
 import requests
-from timedelta_isoformat import timedelta
 
+from .columnar import VideoColumns
+from .metrics import metrics
+from .records import VideoRecord
 
-def get_batch_size(_list: List[str], batch_size: int = 10) -> List[List[str]]:
-    return [_list[i : i + batch_size] for i in range(0, len(_list), batch_size)]
+logger = logging.getLogger(__name__)
 
+# the `videos` endpoint accepts at most 50 ids per request
+VIDEOS_MAX_IDS = 50
+# batch size used before the planner, only kept to report the savings
+LEGACY_BATCH_SIZE = 10
+# the ids are joined with url encoded commas, keep the param well below the
+# url length limits of proxies and servers
+MAX_ID_PARAM_LENGTH = 1500
 
-def parse_iso8601_duration(duration: str):
-    if duration is None:
-        return None
 
-    try:
-        duration_components = timedelta.fromisoformat(duration)
-    except (ValueError, TypeError):
-        duration_components = duration
+def get_batch_size(
+    _list: List[str], batch_size: int = VIDEOS_MAX_IDS
+) -> List[List[str]]:
+    return [_list[i : i + batch_size] for i in range(0, len(_list), batch_size)]
 
-    return duration_components
 
+class BatchSize:
+    """
+    Adaptive `videos` batch size of one crawl.
+
+    A failed batch halves it for the following plans of the crawl, and each
+    successful round grows it back towards `max_size`. Batches of one crawl
+    may finish on several threads, so changes are taken under a lock.
+    """
+
+    def __init__(self, max_size: int = VIDEOS_MAX_IDS, min_size: int = 1):
+        self.max_size = max_size
+        self.min_size = min_size
+        self.value = max_size
+        self._lock = threading.Lock()
+
+    def shrink(self):
+        with self._lock:
+            self.value = max(self.min_size, self.value // 2)
+
+    def grow(self):
+        with self._lock:
+            self.value = min(self.max_size, self.value * 2)
+
+
+class BatchPlanner:
+    """
+    Packs video ids into as few `videos` requests as possible.
+
+    Duplicate and empty ids are dropped, and batches are cut at the crawl's
+    `BatchSize` or `max_param_length` characters, whichever comes first. The
+    planner itself holds no per-crawl state and is shared by every request;
+    the batches planned and saved against the legacy size of 10 are counted
+    in the "nokey_batches" metrics.
+    """
+
+    METRICS_NAMESPACE = 'nokey_batches'
+
+    def __init__(
+        self,
+        max_size: int = VIDEOS_MAX_IDS,
+        min_size: int = 1,
+        max_param_length: int = MAX_ID_PARAM_LENGTH,
+    ):
+        self.max_size = max_size
+        self.min_size = min_size
+        self.max_param_length = max_param_length
+
+    def new_batch_size(self) -> BatchSize:
+        return BatchSize(self.max_size, self.min_size)
+
+    def plan(
+        self, video_ids: List[str], batch_size: Optional[BatchSize] = None
+    ) -> List[List[str]]:
+        size = batch_size.value if batch_size is not None else self.max_size
+        unique_ids = list(dict.fromkeys(video_id for video_id in video_ids if video_id))
+
+        batches = []
+        current = []
+        length = 0
+        for video_id in unique_ids:
+            # every id after the first adds an encoded comma (%2C)
+            extra = len(video_id) + (3 if current else 0)
+            if current and (
+                len(current) >= size or length + extra > self.max_param_length
+            ):
+                batches.append(current)
+                current = []
+                length = 0
+                extra = len(video_id)
+
+            current.append(video_id)
+            length += extra
+
+        if current:
+            batches.append(current)
+
+        legacy_batches = len(get_batch_size(video_ids, LEGACY_BATCH_SIZE))
+        saved = legacy_batches - len(batches)
+        metrics.incr(self.METRICS_NAMESPACE, 'planned', len(batches))
+        metrics.incr(self.METRICS_NAMESPACE, 'saved', saved)
+        logger.debug(
+            'planned %d videos batches for %d ids (%d unique), saved %d of %d',
+            len(batches),
+            len(video_ids),
+            len(unique_ids),
+            saved,
+            legacy_batches,
+        )
+
+        return batches
+
+    def split(self, batch: List[str]) -> List[List[str]]:
+        middle = len(batch) // 2
+        return [batch[:middle], batch[middle:]] if middle else [batch]
+
+
+class NoKeyAPIError(Exception):
+    pass
+
+
+class BaseNoKeyClient:
+    """
+    Request building and response extraction shared by the blocking
+    `NoKeyClient` and the asyncio `AsyncNoKeyClient`.
+    """
 
-class NoKeyClient:
     BASE_URL = 'https://yt.lemnoslife.com/noKey/'
 
-    def __init__(self):
+    def _search_params(self, channel_id: str) -> dict:
+        return {
+            'channelId': channel_id,
+            'part': 'id',
+            'order': 'date',
+            'maxResults': 50,
+            'publishedAfter': '2024-02-03T00:00:00Z',
+            'publishedBefore': '2024-02-03T23:59:59Z',
+        }
+
+    def _videos_params(self, batch: List[str]) -> dict:
+        return {
+            'id': ','.join(batch),
+            'part': 'snippet,statistics,contentDetails',
+        }
+
+    def _get_video_ids(self, items: List[Dict]) -> List[str]:
+        return [item.get('id', {}).get('videoId', None) for item in items]
+
+    def _collect_batches(
+        self,
+        batches: List[List[str]],
+        responses: List[Union[Dict, str]],
+        video_details: List[Dict],
+        errors: List[str],
+        batch_size: BatchSize,
+        retry: bool = True,
+    ) -> List[List[str]]:
+        """
+        Add the items of successful responses to `video_details` and return
+        the failed batches split in half for one more attempt.
+        """
+        retry_batches = []
+
+        for batch, response in zip(batches, responses):
+            # a failed batch only drops its own videos, not the whole result
+            if isinstance(response, str):
+                if retry and len(batch) > 1:
+                    retry_batches.extend(self.planner.split(batch))
+                else:
+                    logger.warning('videos batch %s failed: %s', batch, response)
+                    errors.append(response)
+                continue
+
+            video_details.extend(response.get('items', []))
+
+        if retry:
+            if retry_batches or errors:
+                batch_size.shrink()
+            else:
+                batch_size.grow()
+
+        return retry_batches
+
+    def _merge_videos(
+        self, video_ids: List[str], cached: Dict[str, Dict], fetched: List[Dict]
+    ) -> List[Dict]:
+        # put cached and freshly fetched videos back in search order
+        videos = dict(cached)
+        videos.update((video.get('id', None), video) for video in fetched)
+        return [videos[video_id] for video_id in video_ids if video_id in videos]
+
+    def _batch_result(self, result: Union[List[VideoRecord], str]) -> List[VideoRecord]:
+        # while streaming, a failed batch is logged and skipped
+        if isinstance(result, str):
+            logger.warning('videos batch failed while streaming: %s', result)
+            return []
+        return result
+
+    def get_extract_video_details(self, videos: List[Dict]) -> List[VideoRecord]:
+        return [
+            VideoRecord.from_video(video) for video in videos if video.get('id', None)
+        ]
+
+
+class NoKeyClient(BaseNoKeyClient):
+    def __init__(self, max_workers: int = 8, response_cache=None, video_cache=None):
+        # max_workers bounds how many `videos` batches are in flight at once
+        self.max_workers = max(1, max_workers)
+        self.planner = BatchPlanner()
+        self.response_cache = response_cache
+        self.video_cache = video_cache
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_workers
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def _create_client(self, query: str, params: dict) -> Union[Dict, str]:
+        if self.response_cache is None:
+            return self._request(query, params)
+
+        # callers mutate params between pages, keep our own copy
+        params = dict(params)
+        return self.response_cache.get_or_fetch(
+            query, params, lambda: self._request(query, params)
+        )
+
+    def _request(self, query: str, params: dict) -> Union[Dict, str]:
         url = self.BASE_URL + query
         response = self.session.get(url, params=params)
 
@@ -35,39 +243,56 @@ class NoKeyClient:
         else:
             return f"Error in API request: {response.status_code} {response.text}"
 
-    def _search(self, channel_id: str) -> Union[List[Dict], str]:
+    def _search(self, channel_id: str) -> Union[List[VideoRecord], str]:
+        videos = self._search_videos(channel_id)
+        if isinstance(videos, str):
+            return videos
+        return self.get_extract_video_details(videos)
+
+    def get_video_columns(self, channel_id: str) -> Union[VideoColumns, str]:
+        """
+        Crawl a channel into typed columns instead of one dict per video.
+        """
+        videos = self._search_videos(channel_id)
+        if isinstance(videos, str):
+            return videos
+        return VideoColumns.from_videos(videos)
+
+    def _search_videos(self, channel_id: str) -> Union[List[Dict], str]:
         query = 'search'
-        params = {
-            'channelId': channel_id,
-            'part': 'id',
-            'order': 'date',
-            'maxResults': 50,
-            'publishedAfter': '2024-02-03T00:00:00Z',
-            'publishedBefore': '2024-02-03T23:59:59Z',
-        }
+        params = self._search_params(channel_id)
 
         try:
             items = self._get_all_items(query, params)
-            video_ids = [item.get('id', {}).get('videoId', None) for item in items]
-            return self._get_video_details_by_id(video_ids)
+            if isinstance(items, str):
+                return items
+
+            video_ids = self._get_video_ids(items)
+            return self._get_videos_by_id(video_ids)
 
         except requests.exceptions.RequestException as e:
             return f"Error in API request: {str(e)}"
         except KeyError as ke:
             return f"KeyError: {str(ke)}"
 
-    def _get_all_items(self, url: str, params: dict) -> List[Dict]:
-        items_list = []
+    def _iter_items(self, url: str, params: dict) -> Iterator[Dict]:
+        """
+        Yield the items of every result page as soon as the page arrives.
+        """
         next_page_token = None
 
         while True:
             if next_page_token:
                 params['pageToken'] = next_page_token
 
-            response = self._create_client(url, params)
+            try:
+                response = self._create_client(url, params)
+            except requests.exceptions.RequestException as e:
+                # streamed crawls report it like any other failed page
+                raise NoKeyAPIError(f"Error in API request: {str(e)}") from e
 
             if isinstance(response, str):
-                return response
+                raise NoKeyAPIError(response)
 
             items = response.get('items', [])
             next_page_token = response.get('nextPageToken', None)
@@ -75,60 +300,123 @@ class NoKeyClient:
             if not items:
                 break
 
-            items_list.extend(items)
+            yield from items
 
             if not next_page_token:
                 break
 
-        return items_list
-
-    def _get_video_details_by_id(self, video_ids: List[str]) -> List[dict]:
-        video_details = []
-
-        for current_batch in get_batch_size(video_ids):
-            print('current_batch', current_batch)
+    def _get_all_items(self, url: str, params: dict) -> List[Dict]:
+        try:
+            return list(self._iter_items(url, params))
+        except NoKeyAPIError as e:
+            return str(e)
+
+    def iter_video_details(self, channel_id: str) -> Iterator[VideoRecord]:
+        """
+        Streaming counterpart of `_search`.
+
+        Video ids are sent off in detail batches while the search is still
+        paginating, and extracted videos are yielded batch by batch in search
+        order. At most `max_workers` batches are buffered, so memory does not
+        grow with the size of the channel.
+        """
+        query = 'search'
+        params = self._search_params(channel_id)
 
-            query = 'videos'
-            params = {
-                'id': ','.join(current_batch),
-                'part': 'snippet,statistics,contentDetails',
-            }
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        batch_size = self.planner.new_batch_size()
+        pending = deque()
+        batch = []
 
-            response = self._create_client(query, params)
+        try:
+            for item in self._iter_items(query, params):
+                video_id = item.get('id', {}).get('videoId', None)
+                if not video_id:
+                    continue
+
+                batch.append(video_id)
+                if len(batch) >= batch_size.value:
+                    pending.append(
+                        executor.submit(
+                            self._get_video_details_by_id, batch, batch_size
+                        )
+                    )
+                    batch = []
+
+                # hand out finished batches without holding up pagination
+                while pending and (
+                    pending[0].done() or len(pending) >= self.max_workers
+                ):
+                    yield from self._batch_result(pending.popleft().result())
+
+            if batch:
+                pending.append(
+                    executor.submit(self._get_video_details_by_id, batch, batch_size)
+                )
 
-            if isinstance(response, str):
-                return response
+            while pending:
+                yield from self._batch_result(pending.popleft().result())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            video_details.extend(response.get('items', []))
+    def _fetch_batch(self, batch: List[str]) -> Union[Dict, str]:
+        query = 'videos'
+        params = self._videos_params(batch)
 
-        return self.get_extract_video_details(video_details)
-
-    def get_extract_video_details(self, videos: List[Dict]) -> List[Dict]:
-        extracted_videos = []
-
-        for video in videos:
-            video_id = video.get('id', None)
-            snippet = video.get('snippet', {})
-            statistics = video.get('statistics', {})
-            content = video.get('contentDetails', {})
-            print('content', content)
-            if video_id:
-                extracted_videos.append(
-                    {
-                        'id': video_id,
-                        'title': snippet.get('title', None),
-                        'published_at': snippet.get('publishedAt', None),
-                        'channel_title': snippet.get('channelTitle', None),
-                        'thumbnail': snippet.get('thumbnails', {})
-                        .get('medium', {})
-                        .get('url', None),
-                        'duration': parse_iso8601_duration(
-                            content.get('duration', None)
-                        ),
-                        'view_count': statistics.get('viewCount', None),
-                        'like_count': statistics.get('likeCount', None),
-                        'comment_count': statistics.get('commentCount', None),
-                    }
-                )
+        try:
+            return self._create_client(query, params)
+        except requests.exceptions.RequestException as e:
+            return f"Error in API request: {str(e)}"
 
-        return extracted_videos
+    def _fetch_batches(self, batches: List[List[str]]) -> List[Union[Dict, str]]:
+        """
+        Fetch the `videos` batches with at most `max_workers` requests in flight.
+        Responses come back in the same order as `batches`.
+        """
+        if len(batches) <= 1 or self.max_workers == 1:
+            return [self._fetch_batch(batch) for batch in batches]
+
+        workers = min(self.max_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._fetch_batch, batches))
+
+    def _get_video_details_by_id(
+        self, video_ids: List[str], batch_size: Optional[BatchSize] = None
+    ) -> Union[List[VideoRecord], str]:
+        videos = self._get_videos_by_id(video_ids, batch_size)
+        if isinstance(videos, str):
+            return videos
+        return self.get_extract_video_details(videos)
+
+    def _get_videos_by_id(
+        self, video_ids: List[str], batch_size: Optional[BatchSize] = None
+    ) -> Union[List[Dict], str]:
+        video_details = []
+        errors = []
+        # streamed crawls pass theirs, a single call adapts on its own
+        batch_size = batch_size or self.planner.new_batch_size()
+
+        # only the videos missing from the cache are requested upstream
+        cached = self.video_cache.get_many(video_ids) if self.video_cache else {}
+        missing = [video_id for video_id in video_ids if video_id not in cached]
+
+        batches = self.planner.plan(missing, batch_size)
+        retry_batches = self._collect_batches(
+            batches, self._fetch_batches(batches), video_details, errors, batch_size
+        )
+        self._collect_batches(
+            retry_batches,
+            self._fetch_batches(retry_batches),
+            video_details,
+            errors,
+            batch_size,
+            retry=False,
+        )
+
+        if errors and not video_details and not cached:
+            return errors[0]
+
+        if self.video_cache:
+            self.video_cache.set_many(video_details)
+
+        return self._merge_videos(video_ids, cached, video_details)
@@ -0,0 +1,209 @@
+import atexit
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+# latency histogram buckets, bucket i holds samples up to 2 ** i / 64 ms,
+# from ~16us to ~4min
+LATENCY_BUCKETS = 24
+
+
+def get_latency_bucket(seconds: float) -> int:
+    ms = seconds * 1000
+    if ms <= 1 / 64:
+        return 0
+    return min(math.ceil(math.log2(ms * 64)), LATENCY_BUCKETS - 1)
+
+
+def get_bucket_upper_ms(bucket: int) -> float:
+    return 2**bucket / 64
+
+
+def get_percentile_ms(histogram: Dict[int, int], percentile: float):
+    """
+    Estimate a percentile from bucket counts, as the upper bound of the bucket
+    it falls in.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    rank = total * percentile / 100
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return get_bucket_upper_ms(bucket)
+    return get_bucket_upper_ms(max(histogram))
+
+
+class CacheMetrics:
+    """
+    Hit, miss, set, eviction and rebuild counters and latency histograms for
+    every cache namespace.
+
+    Every thread of the process records into one store under a short lock,
+    so counts of short-lived request and pool threads are kept. A daemon
+    thread adds them to Redis hashes, shared by all processes, every
+    `flush_interval` seconds and once more when the process exits.
+    """
+
+    def __init__(
+        self,
+        key_prefix: str = 'metrics',
+        flush_interval: float = 10,
+        cache_alias: str = 'default',
+    ):
+        self.key_prefix = key_prefix
+        self.flush_interval = flush_interval
+        self.cache_alias = cache_alias
+        self.namespaces_key = f'{key_prefix}:namespaces'
+        self._reset_store()
+        # a forked worker starts with its own empty store and flusher
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_store)
+
+    @classmethod
+    def from_settings(cls, config: dict, **kwargs) -> 'CacheMetrics':
+        return cls(
+            flush_interval=config.get('FLUSH_INTERVAL', 10),
+            cache_alias=config.get('CACHE_ALIAS', 'default'),
+            **kwargs,
+        )
+
+    @property
+    def redis(self):
+        return get_redis_connection(self.cache_alias)
+
+    def _counters_key(self, namespace: str) -> str:
+        return f'{self.key_prefix}:{namespace}'
+
+    def _latency_key(self, namespace: str) -> str:
+        return f'{self.key_prefix}:{namespace}:latency'
+
+    def _reset_store(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._latencies: Dict[str, Dict[int, int]] = {}
+        self._flusher_pid = None
+
+    def _ensure_flusher(self):
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(
+            target=self._run_flusher, name='cache-metrics-flush', daemon=True
+        ).start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def incr(self, namespace: str, event: str, amount: int = 1):
+        if not amount:
+            return
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {})
+            counters[event] = counters.get(event, 0) + amount
+        self._ensure_flusher()
+
+    def observe(self, namespace: str, seconds: float):
+        bucket = get_latency_bucket(seconds)
+        with self._lock:
+            histogram = self._latencies.setdefault(namespace, {})
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        self._ensure_flusher()
+
+    @contextmanager
+    def timer(self, namespace: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(namespace, time.perf_counter() - start)
+
+    def flush(self):
+        """
+        Add the counts recorded by the process to Redis and start over.
+        """
+        with self._lock:
+            counters, latencies = self._counters, self._latencies
+            self._counters, self._latencies = {}, {}
+        if not counters and not latencies:
+            return
+
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for namespace, events in counters.items():
+                for event, amount in events.items():
+                    pipeline.hincrby(self._counters_key(namespace), event, amount)
+            for namespace, histogram in latencies.items():
+                for bucket, amount in histogram.items():
+                    pipeline.hincrby(self._latency_key(namespace), bucket, amount)
+            pipeline.sadd(self.namespaces_key, *(set(counters) | set(latencies)))
+            pipeline.execute()
+        except Exception:
+            # metrics are best effort, a Redis outage must not fail the request
+            pass
+
+    def get_namespaces(self) -> List[str]:
+        return sorted(
+            namespace.decode('utf-8')
+            for namespace in self.redis.smembers(self.namespaces_key)
+        )
+
+    def get_stats(self) -> Dict[str, dict]:
+        """
+        Return the counters, hit rate and p50/p99 latency in ms by namespace.
+        """
+        self.flush()
+        namespaces = self.get_namespaces()
+
+        pipeline = self.redis.pipeline(transaction=False)
+        for namespace in namespaces:
+            pipeline.hgetall(self._counters_key(namespace))
+            pipeline.hgetall(self._latency_key(namespace))
+        results = pipeline.execute()
+
+        stats = {}
+        for position, namespace in enumerate(namespaces):
+            counters, latencies = results[2 * position : 2 * position + 2]
+            counters = {
+                event.decode('utf-8'): int(amount) for event, amount in counters.items()
+            }
+            histogram = {
+                int(bucket): int(amount) for bucket, amount in latencies.items()
+            }
+
+            lookups = counters.get('hits', 0) + counters.get('misses', 0)
+            stats[namespace] = {
+                **counters,
+                'hit_rate': counters.get('hits', 0) / lookups if lookups else None,
+                'samples': sum(histogram.values()),
+                'p50_ms': get_percentile_ms(histogram, 50),
+                'p99_ms': get_percentile_ms(histogram, 99),
+            }
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._counters, self._latencies = {}, {}
+        namespaces = self.get_namespaces()
+        keys = [self.namespaces_key]
+        for namespace in namespaces:
+            keys += [self._counters_key(namespace), self._latency_key(namespace)]
+        self.redis.delete(*keys)
+
+
+metrics = CacheMetrics.from_settings(settings.CACHE_METRICS)
@@ -0,0 +1,26 @@
+from debug_toolbar.panels import Panel
+
+from .metrics import metrics
+
+
+class CacheMetricsPanel(Panel):
+    """
+    Shows the hit rate, counters and latency of every cache namespace, as
+    collected by `server.metrics`.
+    """
+
+    title = 'Cache metrics'
+
+    template = 'panels/cache_metrics.html'
+
+    @property
+    def nav_subtitle(self):
+        stats = self.get_stats().get('namespaces', {})
+        hits = sum(namespace.get('hits', 0) for namespace in stats.values())
+        misses = sum(namespace.get('misses', 0) for namespace in stats.values())
+        if not hits + misses:
+            return ''
+        return f'{hits / (hits + misses):.0%} hits'
+
+    def generate_stats(self, request, response):
+        self.record_stats({'namespaces': metrics.get_stats()})
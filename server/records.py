@@ -0,0 +1,233 @@
+import math
+import struct
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+from .columnar import MISSING, parse_published_at
+from .duration import parse_duration
+
+# published_at (epoch seconds), duration (seconds), view, like and comment
+# counts, then the byte lengths of the utf-8 id and title stored after them
+HEADER = struct.Struct('<qdqqqHi')
+# an int64 field left out by the API, e.g. hidden like counts
+NULL = -(2**63)
+# the thumbnail of nearly every video, derived from its id instead of stored
+THUMBNAIL_URL = 'https://i.ytimg.com/vi/{id}/mqdefault.jpg'
+NO_THUMBNAIL = ''
+
+
+def parse_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_timestamp(value) -> Optional[int]:
+    if isinstance(value, int) or value is None:
+        return value
+    timestamp = parse_published_at(value)
+    return None if timestamp == MISSING else timestamp
+
+
+def format_timestamp(timestamp: int) -> str:
+    # the format of publishedAt, e.g. 2024-02-03T01:01:00Z
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+def get_duration(duration: float):
+    if math.isnan(duration):
+        return None
+    return int(duration) if duration.is_integer() else duration
+
+
+def _header_field(position: int, doc: str) -> property:
+    def get(self):
+        value = HEADER.unpack_from(self._packed)[position]
+        return None if value == NULL else value
+
+    return property(get, doc=doc)
+
+
+class VideoRecord:
+    """
+    One extracted video.
+
+    The numbers, id and title are packed into a single bytes object, with
+    `published_at` as epoch seconds and the duration in seconds, and the
+    standard thumbnail URL is derived from the id. A record keeps about a
+    fifth of the memory of the dict it replaces, and decodes its fields on
+    access. Records pickle as their packed state, and `to_dict` gives the
+    JSON shape rendered by the views, with `published_at` in ISO 8601.
+    """
+
+    FIELDS = (
+        'id',
+        'title',
+        'published_at',
+        'channel_title',
+        'thumbnail',
+        'duration',
+        'view_count',
+        'like_count',
+        'comment_count',
+    )
+    __slots__ = ('_packed', 'channel_title', '_thumbnail')
+
+    def __init__(
+        self,
+        id: str,
+        title: Optional[str] = None,
+        published_at: Optional[int] = None,
+        channel_title: Optional[str] = None,
+        thumbnail: Optional[str] = None,
+        duration: Optional[float] = None,
+        view_count: Optional[int] = None,
+        like_count: Optional[int] = None,
+        comment_count: Optional[int] = None,
+    ):
+        id_bytes = id.encode('utf-8')
+        title_bytes = title.encode('utf-8') if title is not None else b''
+        self._packed = (
+            HEADER.pack(
+                NULL if published_at is None else published_at,
+                math.nan if duration is None else duration,
+                NULL if view_count is None else view_count,
+                NULL if like_count is None else like_count,
+                NULL if comment_count is None else comment_count,
+                len(id_bytes),
+                -1 if title is None else len(title_bytes),
+            )
+            + id_bytes
+            + title_bytes
+        )
+        # every video of a channel shares it, keep a single copy
+        if channel_title:
+            channel_title = sys.intern(channel_title)
+        self.channel_title = channel_title
+        if thumbnail is None:
+            self._thumbnail = NO_THUMBNAIL
+        elif thumbnail == THUMBNAIL_URL.format(id=id):
+            self._thumbnail = None
+        else:
+            self._thumbnail = thumbnail
+
+    @classmethod
+    def from_video(cls, video: Dict) -> 'VideoRecord':
+        """
+        Build a record from a `videos` resource.
+        """
+        snippet = video.get('snippet', {})
+        statistics = video.get('statistics', {})
+        duration = parse_duration(video.get('contentDetails', {}).get('duration', None))
+
+        return cls(
+            video.get('id', None),
+            snippet.get('title', None),
+            parse_timestamp(snippet.get('publishedAt', None)),
+            snippet.get('channelTitle', None),
+            snippet.get('thumbnails', {}).get('medium', {}).get('url', None),
+            duration.seconds if duration is not None else None,
+            parse_int(statistics.get('viewCount', None)),
+            parse_int(statistics.get('likeCount', None)),
+            parse_int(statistics.get('commentCount', None)),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'VideoRecord':
+        values = {field: data.get(field, None) for field in cls.FIELDS}
+        values['published_at'] = parse_timestamp(values['published_at'])
+        return cls(**values)
+
+    @classmethod
+    def from_tuple(cls, values: Tuple) -> 'VideoRecord':
+        return cls(*values)
+
+    @classmethod
+    def _from_state(cls, packed: bytes, channel_title, thumbnail) -> 'VideoRecord':
+        record = cls.__new__(cls)
+        record._packed = packed
+        record.channel_title = channel_title
+        record._thumbnail = thumbnail
+        return record
+
+    @property
+    def id(self) -> str:
+        id_length = HEADER.unpack_from(self._packed)[5]
+        return self._packed[HEADER.size : HEADER.size + id_length].decode('utf-8')
+
+    @property
+    def title(self) -> Optional[str]:
+        *_, id_length, title_length = HEADER.unpack_from(self._packed)
+        if title_length < 0:
+            return None
+        return self._packed[HEADER.size + id_length :].decode('utf-8')
+
+    @property
+    def thumbnail(self) -> Optional[str]:
+        if self._thumbnail is None:
+            return THUMBNAIL_URL.format(id=self.id)
+        return self._thumbnail or None
+
+    @property
+    def duration(self):
+        return get_duration(HEADER.unpack_from(self._packed)[1])
+
+    published_at = _header_field(0, 'Epoch seconds.')
+    view_count = _header_field(2, 'View count.')
+    like_count = _header_field(3, 'Like count.')
+    comment_count = _header_field(4, 'Comment count.')
+
+    def to_tuple(self) -> Tuple:
+        # unpacked once, rather than once per field property
+        (
+            published_at,
+            duration,
+            view_count,
+            like_count,
+            comment_count,
+            id_length,
+            title_length,
+        ) = HEADER.unpack_from(self._packed)
+        video_id = self._packed[HEADER.size : HEADER.size + id_length].decode('utf-8')
+        if self._thumbnail is None:
+            thumbnail = THUMBNAIL_URL.format(id=video_id)
+        else:
+            thumbnail = self._thumbnail or None
+
+        return (
+            video_id,
+            (
+                self._packed[HEADER.size + id_length :].decode('utf-8')
+                if title_length >= 0
+                else None
+            ),
+            None if published_at == NULL else published_at,
+            self.channel_title,
+            thumbnail,
+            get_duration(duration),
+            None if view_count == NULL else view_count,
+            None if like_count == NULL else like_count,
+            None if comment_count == NULL else comment_count,
+        )
+
+    def to_dict(self) -> Dict:
+        data = dict(zip(self.FIELDS, self.to_tuple()))
+        if data['published_at'] is not None:
+            data['published_at'] = format_timestamp(data['published_at'])
+        return data
+
+    def _get_state(self) -> Tuple:
+        return self._packed, self.channel_title, self._thumbnail
+
+    def __reduce__(self):
+        return self._from_state, self._get_state()
+
+    def __eq__(self, other):
+        if not isinstance(other, VideoRecord):
+            return NotImplemented
+        return self._get_state() == other._get_state()
+
+    def __repr__(self):
+        return f'VideoRecord(id={self.id!r}, title={self.title!r})'
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Redis backed cache for upstream API responses.
+
+    Entries are keyed on the endpoint and the normalized request params. Each
+    endpoint gets its own TTL; once an entry is older than its TTL it is still
+    served for `stale_ttl` more seconds while a single background refresh
+    replaces it. The number of entries is capped at `max_entries`, evicting the
+    least recently used ones first.
+    """
+
+    def __init__(
+        self,
+        namespace: str = 'nokey',
+        ttls: Optional[Dict[str, int]] = None,
+        default_ttl: int = 300,
+        stale_ttl: int = 600,
+        max_entries: int = 10000,
+        cache_alias: str = 'default',
+    ):
+        self.namespace = namespace
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self.index_key = f'{namespace}:index'
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._tasks = set()
+
+    @classmethod
+    def from_settings(cls, config: dict, **kwargs) -> 'ResponseCache':
+        return cls(
+            ttls=config.get('TTLS'),
+            default_ttl=config.get('DEFAULT_TTL', 300),
+            stale_ttl=config.get('STALE_TTL', 600),
+            max_entries=config.get('MAX_ENTRIES', 10000),
+            **kwargs,
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def redis(self):
+        return get_redis_connection(self.cache_alias)
+
+    def get_ttl(self, query: str) -> int:
+        return self.ttls.get(query, self.default_ttl)
+
+    def normalize_params(self, params: dict) -> str:
+        return '&'.join(
+            f'{key}={value}'
+            for key, value in sorted(params.items())
+            if value is not None
+        )
+
+    def make_key(self, query: str, params: dict) -> str:
+        digest = hashlib.sha1(self.normalize_params(params).encode('utf-8'))
+        return f'{self.namespace}:{query}:{digest.hexdigest()}'
+
+    def get(self, query: str, params: dict) -> Tuple[Any, bool]:
+        """
+        Return `(data, is_stale)`, or `(None, False)` on a miss.
+        """
+        key = self.make_key(query, params)
+        with metrics.timer(self.namespace):
+            entry = self.cache.get(key)
+        if entry is None:
+            metrics.incr(self.namespace, 'misses')
+            return None, False
+
+        self.redis.zadd(self.index_key, {key: time.time()})
+        is_stale = entry['expires_at'] <= time.time()
+        metrics.incr(self.namespace, 'hits')
+        if is_stale:
+            metrics.incr(self.namespace, 'stale_hits')
+        return entry['data'], is_stale
+
+    def set(self, query: str, params: dict, data: Any):
+        ttl = self.get_ttl(query)
+        key = self.make_key(query, params)
+        now = time.time()
+
+        self.cache.set(
+            key, {'data': data, 'expires_at': now + ttl}, ttl + self.stale_ttl
+        )
+        self.redis.zadd(self.index_key, {key: now})
+        metrics.incr(self.namespace, 'sets')
+        self._evict()
+
+    def _evict(self):
+        excess = self.redis.zcard(self.index_key) - self.max_entries
+        if excess <= 0:
+            return
+
+        evicted = [
+            key.decode('utf-8') if isinstance(key, bytes) else key
+            for key, _ in self.redis.zpopmin(self.index_key, excess)
+        ]
+        self.cache.delete_many(evicted)
+        metrics.incr(self.namespace, 'evictions', len(evicted))
+
+    def _claim_refresh(self, query: str, params: dict) -> bool:
+        # only one process refreshes a given stale entry
+        lock_key = f'{self.make_key(query, params)}:refreshing'
+        return self.cache.add(lock_key, 1, timeout=30)
+
+    def _refresh(self, query: str, params: dict, fetch: Callable[[], Any]):
+        try:
+            data = fetch()
+        except Exception:
+            logger.exception('background refresh of %s failed', query)
+            return
+
+        if not isinstance(data, str):
+            self.set(query, params, data)
+
+    def get_or_fetch(self, query: str, params: dict, fetch: Callable[[], Any]) -> Any:
+        if self.get_ttl(query) <= 0:
+            return fetch()
+
+        data, is_stale = self.get(query, params)
+        if data is not None:
+            if is_stale and self._claim_refresh(query, params):
+                self._executor.submit(self._refresh, query, params, fetch)
+            return data
+
+        data = fetch()
+        # error strings are never cached
+        if not isinstance(data, str):
+            self.set(query, params, data)
+        return data
+
+    def _run_sync(self, fn):
+        # Redis only, no ORM: run on the executor rather than the single
+        # thread that thread sensitive calls share
+        return sync_to_async(fn, thread_sensitive=False)
+
+    async def _arefresh(self, query: str, params: dict, fetch):
+        try:
+            data = await fetch()
+        except Exception:
+            logger.exception('background refresh of %s failed', query)
+            return
+
+        if not isinstance(data, str):
+            await self._run_sync(self.set)(query, params, data)
+
+    async def aget_or_fetch(self, query: str, params: dict, fetch) -> Any:
+        """
+        Async variant of `get_or_fetch`, `fetch` is a coroutine function.
+        """
+        if self.get_ttl(query) <= 0:
+            return await fetch()
+
+        data, is_stale = await self._run_sync(self.get)(query, params)
+        if data is not None:
+            if is_stale and await self._run_sync(self._claim_refresh)(query, params):
+                task = asyncio.create_task(self._arefresh(query, params, fetch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return data
+
+        data = await fetch()
+        if not isinstance(data, str):
+            await self._run_sync(self.set)(query, params, data)
+        return data
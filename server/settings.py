@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 
+from debug_toolbar.settings import PANELS_DEFAULTS
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,6 +31,8 @@ ALLOWED_HOSTS = ['*']
 
 INTERNAL_IPS = ["127.0.0.1"]
 
+DEBUG_TOOLBAR_PANELS = PANELS_DEFAULTS + ['server.panels.CacheMetricsPanel']
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -166,3 +170,37 @@ REST_FRAMEWORK = {
     #     'rest_framework.renderers.JSONRenderer',
     # ],
 }
+
+
+# noKey YouTube client settings
+# max number of `videos` batch requests in flight per channel lookup
+NOKEY_MAX_IN_FLIGHT = 8
+# max number of concurrent upstream requests for the async client, shared by
+# every lookup in the process
+NOKEY_ASYNC_MAX_IN_FLIGHT = 100
+
+# upstream response cache, TTLs are in seconds per noKey endpoint. Expired
+# entries are served for STALE_TTL more seconds while they refresh.
+NOKEY_RESPONSE_CACHE = {
+    'TTLS': {
+        'search': 5 * 60,
+        # videos are cached per id by NOKEY_VIDEO_CACHE instead
+        'videos': 0,
+    },
+    'DEFAULT_TTL': 5 * 60,
+    'STALE_TTL': 10 * 60,
+    'MAX_ENTRIES': 10000,
+}
+
+# per video id cache, statistics expire sooner than the snippet
+NOKEY_VIDEO_CACHE = {
+    'SNIPPET_TTL': 24 * 60 * 60,
+    'STATISTICS_TTL': 15 * 60,
+}
+
+# cache hit/miss/latency counters, a background thread of every process adds
+# them to Redis every FLUSH_INTERVAL seconds
+CACHE_METRICS = {
+    'FLUSH_INTERVAL': 10,
+    'CACHE_ALIAS': 'default',
+}
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution.
+
+    Inside a process, callers for a key that is already running wait on the
+    leader's future. Across processes, the leader holds a Redis lock and
+    publishes its result under a short-lived result key that the other
+    processes poll for. When the lock disappears without a result (the leader
+    failed or timed out) a waiting caller takes over.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        lock_timeout: int = 120,
+        result_ttl: int = 10,
+        wait_timeout: float = 120,
+        poll_interval: float = 0.1,
+        cache_alias: str = 'default',
+    ):
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.cache_alias = cache_alias
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        # (event loop, key) -> the task running the shared call
+        self._async_calls: Dict[Tuple[Any, str], asyncio.Task] = {}
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def redis(self):
+        return get_redis_connection(self.cache_alias)
+
+    def _lock_key(self, key: str) -> str:
+        return f'singleflight:{self.namespace}:{key}:lock'
+
+    def _result_key(self, key: str) -> str:
+        return f'singleflight:{self.namespace}:{key}:result'
+
+    def _get_result(self, key: str):
+        return self.cache.get(self._result_key(key))
+
+    def _set_result(self, key: str, result: Any):
+        # error strings are not shared, the next caller retries instead
+        if not isinstance(result, str):
+            self.cache.set(self._result_key(key), {'result': result}, self.result_ttl)
+
+    def _acquire(self, key: str):
+        # not thread local: async callers may acquire and release on different
+        # executor threads
+        lock = self.redis.lock(
+            self._lock_key(key), timeout=self.lock_timeout, thread_local=False
+        )
+        return lock if lock.acquire(blocking=False) else None
+
+    def _release(self, lock):
+        try:
+            lock.release()
+        except LockError:
+            # the lock already expired, someone else may own it now
+            pass
+
+    def _is_locked(self, key: str) -> bool:
+        return bool(self.redis.exists(self._lock_key(key)))
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = self._do_shared(key, fn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+        return result
+
+    def _do_shared(self, key: str, fn: Callable[[], Any]) -> Any:
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            entry = self._get_result(key)
+            if entry is not None:
+                return entry['result']
+
+            lock = self._acquire(key)
+            if lock is not None:
+                try:
+                    result = fn()
+                    self._set_result(key, result)
+                    return result
+                finally:
+                    self._release(lock)
+
+            while self._is_locked(key):
+                if time.monotonic() >= deadline:
+                    # the leader is taking too long, stop waiting on it
+                    return fn()
+                time.sleep(self.poll_interval)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of `do`, `fn` is a coroutine function.
+
+        The shared call runs in a task of its own, so a caller whose request
+        is cancelled stops waiting without cancelling it for the others.
+        """
+        # futures are bound to their event loop, calls are coalesced per loop
+        call_key = (asyncio.get_running_loop(), key)
+        task = self._async_calls.get(call_key)
+        if task is None:
+            task = asyncio.ensure_future(self._ado_shared(key, fn))
+            self._async_calls[call_key] = task
+            task.add_done_callback(lambda done: self._forget_async(call_key, done))
+
+        return await asyncio.shield(task)
+
+    def _forget_async(self, call_key, task: asyncio.Task):
+        if self._async_calls.get(call_key) is task:
+            del self._async_calls[call_key]
+        # mark the exception as retrieved when every caller stopped waiting
+        if not task.cancelled():
+            task.exception()
+
+    def _run_sync(self, fn):
+        # Redis only, no ORM: waiters poll on the executor rather than the
+        # single thread that thread sensitive calls share
+        return sync_to_async(fn, thread_sensitive=False)
+
+    async def _ado_shared(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            entry = await self._run_sync(self._get_result)(key)
+            if entry is not None:
+                return entry['result']
+
+            lock = await self._run_sync(self._acquire)(key)
+            if lock is not None:
+                try:
+                    result = await fn()
+                    await self._run_sync(self._set_result)(key, result)
+                    return result
+                finally:
+                    await self._run_sync(self._release)(lock)
+
+            while await self._run_sync(self._is_locked)(key):
+                if time.monotonic() >= deadline:
+                    return await fn()
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,415 @@
+import asyncio
+import datetime
+import pickle
+import threading
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase
+
+from . import columnar
+from .duration import parse_duration, parse_many
+from .helper import BatchPlanner, BatchSize
+from .records import VideoRecord
+from .response_cache import ResponseCache
+from .singleflight import SingleFlight
+from .video_cache import VideoCache
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.response_cache = ResponseCache(
+            namespace='test-nokey', ttls={'search': 60, 'videos': 0}, max_entries=3
+        )
+        self.addCleanup(self.clear)
+        self.fetches = []
+
+    def clear(self):
+        self.response_cache._executor.shutdown(wait=True)
+        self.response_cache.cache.delete_pattern('test-nokey:*')
+
+    def fetch(self, data=None):
+        data = {'items': []} if data is None else data
+
+        def fetch():
+            self.fetches.append(data)
+            return data
+
+        return fetch
+
+    def expire(self, query, params):
+        key = self.response_cache.make_key(query, params)
+        entry = self.response_cache.cache.get(key)
+        entry['expires_at'] = 0
+        self.response_cache.cache.set(key, entry)
+
+    def test_keys_ignore_param_order_and_missing_values(self):
+        self.assertEqual(
+            self.response_cache.make_key('search', {'a': 1, 'b': 2}),
+            self.response_cache.make_key('search', {'b': 2, 'a': 1, 'c': None}),
+        )
+        self.assertNotEqual(
+            self.response_cache.make_key('search', {'a': 1}),
+            self.response_cache.make_key('videos', {'a': 1}),
+        )
+
+    def test_hits_do_not_fetch(self):
+        params = {'channelId': 'UC1'}
+        self.response_cache.get_or_fetch('search', params, self.fetch())
+
+        self.assertEqual(
+            self.response_cache.get_or_fetch('search', params, self.fetch()),
+            {'items': []},
+        )
+        self.assertEqual(len(self.fetches), 1)
+
+    def test_error_strings_and_zero_ttls_are_not_cached(self):
+        self.response_cache.get_or_fetch('search', {}, self.fetch('Error'))
+        self.response_cache.get_or_fetch('videos', {}, self.fetch())
+
+        self.assertEqual(self.response_cache.get('search', {}), (None, False))
+        self.assertEqual(self.response_cache.get('videos', {}), (None, False))
+
+    def test_stale_entries_are_served_and_refreshed_once(self):
+        self.response_cache.set('search', {}, {'items': ['old']})
+        self.expire('search', {})
+
+        fetch = self.fetch({'items': ['new']})
+        self.assertEqual(
+            self.response_cache.get_or_fetch('search', {}, fetch), {'items': ['old']}
+        )
+        self.response_cache.get_or_fetch('search', {}, fetch)
+        self.response_cache._executor.shutdown(wait=True)
+
+        self.assertEqual(len(self.fetches), 1)
+        self.assertEqual(
+            self.response_cache.get('search', {}), ({'items': ['new']}, False)
+        )
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for page in range(3):
+            self.response_cache.set('search', {'page': page}, {'page': page})
+        self.response_cache.get('search', {'page': 0})
+
+        self.response_cache.set('search', {'page': 3}, {'page': 3})
+
+        self.assertEqual(self.response_cache.get('search', {'page': 1}), (None, False))
+        self.assertEqual(
+            self.response_cache.get('search', {'page': 0}), ({'page': 0}, False)
+        )
+
+    async def test_async_hits_do_not_fetch(self):
+        async def fetch():
+            self.fetches.append(1)
+            return {'items': []}
+
+        await self.response_cache.aget_or_fetch('search', {}, fetch)
+        data = await self.response_cache.aget_or_fetch('search', {}, fetch)
+
+        self.assertEqual(data, {'items': []})
+        self.assertEqual(len(self.fetches), 1)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.flight = SingleFlight('test', poll_interval=0.01)
+        self.addCleanup(self.flight.cache.delete_pattern, 'singleflight:test:*')
+        self.calls = 0
+
+    def test_concurrent_calls_run_once(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def fn():
+            self.calls += 1
+            started.set()
+            release.wait(5)
+            return {'calls': self.calls}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.flight.do('k', fn)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'calls': 1}] * 5)
+
+    def test_results_are_shared_across_processes(self):
+        self.flight._set_result('k', {'shared': True})
+
+        self.assertEqual(
+            self.flight.do('k', lambda: {'shared': False}), {'shared': True}
+        )
+
+    def test_error_strings_are_not_shared(self):
+        self.flight.do('k', lambda: 'Error in API request')
+
+        self.assertIsNone(self.flight._get_result('k'))
+
+    def test_waiters_take_over_from_a_leader_that_failed(self):
+        # another process holds the lock and dies without a result
+        lock = self.flight._acquire('k')
+        threading.Timer(0.05, lock.release).start()
+
+        self.assertEqual(self.flight.do('k', lambda: 'retried'), 'retried')
+
+    async def test_async_calls_survive_the_leader_being_cancelled(self):
+        release = asyncio.Event()
+
+        async def fn():
+            self.calls += 1
+            await release.wait()
+            return {'calls': self.calls}
+
+        leader = asyncio.ensure_future(self.flight.ado('k', fn))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(self.flight.ado('k', fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        self.assertEqual(await follower, {'calls': 1})
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 1)
+
+
+class VideoCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.video_cache = VideoCache(namespace='test-video')
+        self.addCleanup(self.video_cache.cache.delete_pattern, 'test-video:*')
+
+    def make_video(self, video_id):
+        return {
+            'id': video_id,
+            'snippet': {'title': video_id},
+            'contentDetails': {'duration': 'PT5M'},
+            'statistics': {'viewCount': '1'},
+        }
+
+    def test_cached_videos_are_returned_by_id(self):
+        self.video_cache.set_many(
+            [self.make_video('a'), self.make_video('b'), {'snippet': {}}]
+        )
+
+        self.assertEqual(
+            self.video_cache.get_many(['a', 'b', 'c', None]),
+            {'a': self.make_video('a'), 'b': self.make_video('b')},
+        )
+        self.assertEqual(self.video_cache.get_many([]), {})
+
+    def test_expired_statistics_are_a_miss(self):
+        self.video_cache.set_many([self.make_video('a')])
+        self.video_cache.cache.delete(self.video_cache._statistics_key('a'))
+
+        self.assertEqual(self.video_cache.get_many(['a']), {})
+
+
+class BatchPlannerTests(SimpleTestCase):
+    def setUp(self):
+        self.planner = BatchPlanner(max_param_length=100)
+
+    def test_duplicate_and_empty_ids_are_dropped(self):
+        self.assertEqual(
+            self.planner.plan(['a', 'b', '', 'a', None, 'c']), [['a', 'b', 'c']]
+        )
+
+    def test_batches_are_cut_at_the_batch_size(self):
+        video_ids = [f'{index:02}' for index in range(12)]
+        batch_size = BatchSize(max_size=5)
+
+        self.assertEqual(
+            [len(batch) for batch in self.planner.plan(video_ids, batch_size)],
+            [5, 5, 2],
+        )
+
+    def test_batches_are_cut_at_the_param_length(self):
+        # 11 characters per id, plus 3 for every encoded comma
+        video_ids = [f'{index:011}' for index in range(20)]
+
+        batches = self.planner.plan(video_ids)
+
+        self.assertEqual([len(batch) for batch in batches], [7, 7, 6])
+        for batch in batches:
+            self.assertLessEqual(len('%2C'.join(batch)), 100)
+
+    def test_batch_sizes_adapt_per_crawl(self):
+        batch_size = self.planner.new_batch_size()
+        other = self.planner.new_batch_size()
+
+        batch_size.shrink()
+        batch_size.shrink()
+        self.assertEqual(batch_size.value, 12)
+        self.assertEqual(other.value, 50)
+
+        for _ in range(5):
+            batch_size.grow()
+        self.assertEqual(batch_size.value, 50)
+
+    def test_batch_sizes_stay_above_the_minimum(self):
+        batch_size = BatchSize(max_size=4, min_size=2)
+        for _ in range(3):
+            batch_size.shrink()
+
+        self.assertEqual(batch_size.value, 2)
+
+    def test_split(self):
+        self.assertEqual(self.planner.split(['a', 'b', 'c']), [['a'], ['b', 'c']])
+        self.assertEqual(self.planner.split(['a']), [['a']])
+
+
+class DurationTests(SimpleTestCase):
+    def test_single_unit_durations(self):
+        # the old _convert_duration copies got these wrong
+        self.assertEqual(parse_duration('PT5M').to_hms(), (0, 5, 0))
+        self.assertEqual(parse_duration('PT45S').to_hms(), (0, 0, 45))
+        self.assertEqual(parse_duration('PT2H').to_hms(), (2, 0, 0))
+
+    def test_durations(self):
+        self.assertEqual(parse_duration('PT1H2M3S').seconds, 3723)
+        self.assertEqual(parse_duration('P1DT2H').seconds, 93600)
+        self.assertEqual(parse_duration('P1W').seconds, 604800)
+        self.assertEqual(parse_duration('P0D').seconds, 0)
+        self.assertEqual(parse_duration('PT1.5S').seconds, 1.5)
+        self.assertEqual(
+            parse_duration('PT1M30S').timedelta, datetime.timedelta(seconds=90)
+        )
+
+    def test_invalid_durations(self):
+        for value in [None, '', 'P', 'PT', 'P1M', 'P1Y', '1H', 'PT1H2', 'PTS']:
+            with self.subTest(value=value):
+                self.assertIsNone(parse_duration(value))
+
+    def test_parse_many(self):
+        self.assertEqual(
+            parse_many(['PT5M', None, 'PT5M', ['PT5M'], 'bad']),
+            [parse_duration('PT5M'), None, parse_duration('PT5M'), None, None],
+        )
+
+
+class VideoColumnsTests(SimpleTestCase):
+    def setUp(self):
+        self.columns = columnar.VideoColumns.from_videos(
+            [
+                {
+                    'id': f'video-{index}',
+                    'snippet': {
+                        'title': f'Video {index}',
+                        'publishedAt': f'2024-02-0{index + 1}T01:01:00Z',
+                    },
+                    'contentDetails': {'duration': f'PT{index + 1}M'},
+                    'statistics': {'viewCount': str(index * 100)},
+                }
+                for index in range(5)
+            ]
+            + [{'snippet': {'title': 'no id'}}]
+        )
+
+    def without_numpy(self):
+        return mock.patch.object(columnar, 'numpy', None)
+
+    def test_columns_are_typed(self):
+        self.assertEqual(len(self.columns), 5)
+        self.assertEqual(list(self.columns.view_count), [0, 100, 200, 300, 400])
+        self.assertEqual(list(self.columns.duration), [60, 120, 180, 240, 300])
+        self.assertEqual(self.columns.published_at[0], 1706749260)
+        # hidden counts are stored as missing and skipped by aggregates
+        self.assertEqual(list(self.columns.like_count), [columnar.MISSING] * 5)
+        self.assertIsNone(self.columns.mean('like_count'))
+
+    def test_aggregates(self):
+        self.assertEqual(self.columns.total('view_count'), 1000)
+        self.assertEqual(self.columns.mean('duration'), 180)
+        with self.assertRaises(ValueError):
+            self.columns.total('title')
+
+    def test_percentiles_match_numpy(self):
+        with self.without_numpy():
+            self.assertEqual(self.columns.percentile('view_count', 50), 200)
+            self.assertEqual(self.columns.percentile('view_count', 90), 360)
+        if columnar.numpy is not None:
+            self.assertEqual(self.columns.percentile('view_count', 90), 360)
+
+    def test_top(self):
+        expected = [
+            {'id': 'video-4', 'title': 'Video 4', 'view_count': 400},
+            {'id': 'video-3', 'title': 'Video 3', 'view_count': 300},
+        ]
+
+        self.assertEqual(self.columns.top('view_count', 2), expected)
+        with self.without_numpy():
+            self.assertEqual(self.columns.top('view_count', 2), expected)
+
+    def test_top_of_nothing(self):
+        for n in [0, -2]:
+            with self.subTest(n=n):
+                self.assertEqual(self.columns.top('view_count', n), [])
+                with self.without_numpy():
+                    self.assertEqual(self.columns.top('view_count', n), [])
+
+    @skipIf(columnar.numpy is None, 'numpy is not installed')
+    def test_to_numpy(self):
+        arrays = self.columns.to_numpy()
+
+        self.assertEqual(arrays['view_count'].sum(), 1000)
+        self.assertEqual(str(arrays['published_at'][0]), '2024-02-01T01:01:00')
+
+
+class VideoRecordTests(SimpleTestCase):
+    def setUp(self):
+        self.record = VideoRecord.from_video(
+            {
+                'id': 'abc123',
+                'snippet': {
+                    'title': 'Déjà vu',
+                    'publishedAt': '2024-02-03T01:01:00Z',
+                    'channelTitle': 'Channel',
+                    'thumbnails': {
+                        'medium': {'url': 'https://i.ytimg.com/vi/abc123/mqdefault.jpg'}
+                    },
+                },
+                'contentDetails': {'duration': 'PT1M30S'},
+                'statistics': {'viewCount': '1200', 'commentCount': '3'},
+            }
+        )
+
+    def test_to_dict(self):
+        self.assertEqual(
+            self.record.to_dict(),
+            {
+                'id': 'abc123',
+                'title': 'Déjà vu',
+                'published_at': '2024-02-03T01:01:00Z',
+                'channel_title': 'Channel',
+                'thumbnail': 'https://i.ytimg.com/vi/abc123/mqdefault.jpg',
+                'duration': 90,
+                'view_count': 1200,
+                'like_count': None,
+                'comment_count': 3,
+            },
+        )
+
+    def test_round_trips(self):
+        self.assertEqual(VideoRecord.from_dict(self.record.to_dict()), self.record)
+        self.assertEqual(VideoRecord.from_tuple(self.record.to_tuple()), self.record)
+        self.assertEqual(pickle.loads(pickle.dumps(self.record)), self.record)
+
+    def test_missing_fields(self):
+        record = VideoRecord('xyz', duration=1.5)
+
+        self.assertEqual(
+            record.to_tuple(), ('xyz', None, None, None, None, 1.5, None, None, None)
+        )
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_other_thumbnails_are_kept(self):
+        record = VideoRecord('abc123', thumbnail='https://example.com/a.jpg')
+
+        self.assertEqual(record.thumbnail, 'https://example.com/a.jpg')
+        self.assertNotEqual(record, VideoRecord('abc123'))
@@ -18,13 +18,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from server.views import ChannelView
+from server.views import AsyncChannelView, CacheStatsView, ChannelView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('blog.urls')),
     path("__debug__/", include("debug_toolbar.urls")),
     path('api/v1/channels/', ChannelView.as_view(), name='api'),
+    path('api/v1/channels/async/', AsyncChannelView.as_view(), name='api_async'),
+    path('api/v1/cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
 ]
 
 if settings.DEBUG:
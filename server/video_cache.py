@@ -0,0 +1,98 @@
+from typing import Dict, Iterable, List
+
+from django.core.cache import caches
+
+from .metrics import metrics
+
+
+class VideoCache:
+    """
+    Per video id cache of `videos` resources.
+
+    A video is stored as two entries so the fast changing statistics can
+    expire well before the snippet and content details. A video is only a hit
+    when both entries are present.
+    """
+
+    def __init__(
+        self,
+        namespace: str = 'video',
+        snippet_ttl: int = 24 * 60 * 60,
+        statistics_ttl: int = 15 * 60,
+        cache_alias: str = 'default',
+    ):
+        self.namespace = namespace
+        self.snippet_ttl = snippet_ttl
+        self.statistics_ttl = statistics_ttl
+        self.cache_alias = cache_alias
+
+    @classmethod
+    def from_settings(cls, config: dict, **kwargs) -> 'VideoCache':
+        return cls(
+            snippet_ttl=config.get('SNIPPET_TTL', 24 * 60 * 60),
+            statistics_ttl=config.get('STATISTICS_TTL', 15 * 60),
+            **kwargs,
+        )
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _snippet_key(self, video_id: str) -> str:
+        return f'{self.namespace}:snippet:{video_id}'
+
+    def _statistics_key(self, video_id: str) -> str:
+        return f'{self.namespace}:statistics:{video_id}'
+
+    def get_many(self, video_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Look up all ids with a single MGET, returning the hits by id.
+        """
+        video_ids = [video_id for video_id in set(video_ids) if video_id]
+        if not video_ids:
+            return {}
+
+        keys = []
+        for video_id in video_ids:
+            keys.append(self._snippet_key(video_id))
+            keys.append(self._statistics_key(video_id))
+        with metrics.timer(self.namespace):
+            entries = self.cache.get_many(keys)
+
+        videos = {}
+        for video_id in video_ids:
+            snippet = entries.get(self._snippet_key(video_id))
+            statistics = entries.get(self._statistics_key(video_id))
+            if snippet is None or statistics is None:
+                continue
+
+            videos[video_id] = {
+                'id': video_id,
+                'snippet': snippet['snippet'],
+                'contentDetails': snippet['contentDetails'],
+                'statistics': statistics,
+            }
+
+        metrics.incr(self.namespace, 'hits', len(videos))
+        metrics.incr(self.namespace, 'misses', len(video_ids) - len(videos))
+        return videos
+
+    def set_many(self, videos: List[Dict]):
+        snippets = {}
+        statistics = {}
+
+        for video in videos:
+            video_id = video.get('id', None)
+            if not video_id:
+                continue
+
+            snippets[self._snippet_key(video_id)] = {
+                'snippet': video.get('snippet', {}),
+                'contentDetails': video.get('contentDetails', {}),
+            }
+            statistics[self._statistics_key(video_id)] = video.get('statistics', {})
+
+        if snippets:
+            self.cache.set_many(snippets, self.snippet_ttl)
+            self.cache.set_many(statistics, self.statistics_ttl)
+            metrics.incr(self.namespace, 'sets', len(snippets))
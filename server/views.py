@@ -1,21 +1,43 @@
-import concurrent.futures
-import time
-from contextlib import contextmanager
-from itertools import count, cycle
+import json
 
+from django.conf import settings
 from django.core.cache import cache
-from googleapiclient.discovery import build
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from googleapiclient.errors import HttpError
 from rest_framework import status
 from rest_framework.generics import views
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
 from gclient.models import DevKey
+from gclient.quota import KeyPool
+from gclient.services import youtube_services
 
-from .helper import NoKeyClient
+from .async_helper import AsyncNoKeyClient
+from .helper import NoKeyAPIError, NoKeyClient
+from .metrics import metrics
+from .response_cache import ResponseCache
 from .serializers import ChannelSerializers
-
-nokey_client = NoKeyClient()
+from .singleflight import SingleFlight
+from .video_cache import VideoCache
+
+response_cache = ResponseCache.from_settings(settings.NOKEY_RESPONSE_CACHE)
+video_cache = VideoCache.from_settings(settings.NOKEY_VIDEO_CACHE)
+nokey_client = NoKeyClient(
+    max_workers=settings.NOKEY_MAX_IN_FLIGHT,
+    response_cache=response_cache,
+    video_cache=video_cache,
+)
+async_nokey_client = AsyncNoKeyClient(
+    max_in_flight=settings.NOKEY_ASYNC_MAX_IN_FLIGHT,
+    response_cache=response_cache,
+    video_cache=video_cache,
+)
+# concurrent lookups of the same channel share one upstream crawl
+channel_flight = SingleFlight('channels')
 
 
 class YouTubeAPIClient:
@@ -27,79 +49,106 @@ class YouTubeAPIClient:
 
     def __init__(self):
         self.api_keys = self._get_api_keys()
-        self.youtube_clients = cycle(
-            self._create_client(api_key) for api_key in self.api_keys
-        )
-        self.current_client = next(self.youtube_clients)
+        self.key_pool = KeyPool(self.api_keys)
 
     def _get_api_keys(self):
-        api_keys = cache.get(self.API_KEYS_CACHE_KEY)
+        with metrics.timer(self.API_KEYS_CACHE_KEY):
+            api_keys = cache.get(self.API_KEYS_CACHE_KEY)
         if api_keys is None:
-            api_keys = list(
-                DevKey.objects.filter(is_active=True).values_list('key', flat=True)
-            )
+            metrics.incr(self.API_KEYS_CACHE_KEY, 'misses')
+            api_keys = self.load_api_keys()
+        else:
+            metrics.incr(self.API_KEYS_CACHE_KEY, 'hits')
+        return api_keys
 
-        cache.set(self.API_KEYS_CACHE_KEY, api_keys)
+    @classmethod
+    def load_api_keys(cls):
+        api_keys = list(
+            DevKey.objects.filter(is_active=True).values_list('key', flat=True)
+        )
+        cache.set(cls.API_KEYS_CACHE_KEY, api_keys)
+        metrics.incr(cls.API_KEYS_CACHE_KEY, 'sets')
         return api_keys
 
     def _create_client(self, api_key):
-        return build('youtube', 'v3', developerKey=api_key)
-
-    def _rotate_client(self):
-        self.current_client = next(self.youtube_clients)
-
-    # @contextmanager
-    # def current_client_context(self):
-    #     try:
-    #         yield self.current_client
-    #     finally:
-    #         self.quota_exceeded = False
-
-    # def handle_rate_limit(func):
-    #     def wrapper(self, *args, **kwargs):
-    #         while True:
-    #             with self.current_client_context() as client:
-    #                 try:
-    #                     return func(client, *args, **kwargs)
-    #                 except HttpError as e:
-    #                     if e.resp.status == 403 and 'quotaExceeded' in str(e):
-    #                         self.quota_exceeded = True
-    #                         self._rotate_client()
-    #                         time.sleep(20)  # Wait for 60 seconds before trying again
-    #                     else:
-    #                         raise e
-
-    #     return wrapper
-
-    # @handle_rate_limit
-    # def search(self, query, max_results=10):
-    #     with self.current_client_context() as client:
-    #         return (
-    #             client.search()
-    #             .list(q=query, part='id,snippet', maxResults=max_results)
-    #             .execute()
-    #         )
-
-    # @handle_rate_limit
-    # def videos(self, video_ids, part='snippet,contentDetails,statistics'):
-    #     with self.current_client_context() as client:
-    #         return client.videos().list(id=','.join(video_ids), part=part).execute()
-
-    # def search_concurrent(self, queries, max_results=10):
-    #     with concurrent.futures.ThreadPoolExecutor() as executor:
-    #         futures = [
-    #             executor.submit(self.search, query, max_results) for query in queries
-    #         ]
-    #     responses = [future.result() for future in futures]
-    #     return [response['items'] for response in responses]
-
-    # def videos_concurrent(self, video_ids, part='snippet,contentDetails,statistics'):
-    #     with concurrent.futures.ThreadPoolExecutor() as executor:
-    #         futures = [
-    #             executor.submit(self.videos, [video_id], part) for video_id in video_ids
-    #         ]
-    #     responses = [future.result() for future in futures]
-    #     return [response['items'] for response in responses]
+        # built on first use per key and thread, from the cached discovery doc
+        return youtube_services.get(api_key)
+
+    def _execute(self, operation, make_request):
+        """
+        Run the request on the key with the most quota left. A key that hits
+        `quotaExceeded` is parked until the quota resets and the call moves
+        on to the next key, `QuotaExhausted` is raised once none are left.
+        """
+        while True:
+            api_key = self.key_pool.acquire(operation)
+            request = make_request(self._create_client(api_key))
+
+            try:
+                return request.execute()
+            except HttpError as e:
+                if e.resp.status == 403 and 'quotaExceeded' in str(e):
+                    self.key_pool.mark_exhausted(api_key)
+                    continue
+                raise
+
+    def search(self, query, max_results=10):
+        return self._execute(
+            'search',
+            lambda client: client.search().list(
+                q=query, part='id,snippet', maxResults=max_results
+            ),
+        )
+
+    def videos(self, video_ids, part='snippet,contentDetails,statistics'):
+        return self._execute(
+            'videos',
+            lambda client: client.videos().list(id=','.join(video_ids), part=part),
+        )
+
+
+def render_videos(data):
+    # error strings are passed through as they are
+    if isinstance(data, str):
+        return data
+    return [video.to_dict() for video in data]
+
+
+def ndjson_lines(videos):
+    """
+    Render videos as newline delimited JSON, one video per line.
+    """
+    try:
+        for video in videos:
+            yield json.dumps(video.to_dict(), cls=JSONEncoder) + '\n'
+    except NoKeyAPIError as e:
+        yield json.dumps({'error': str(e)}) + '\n'
+
+
+async def ndjson_alines(videos):
+    try:
+        async for video in videos:
+            yield json.dumps(video.to_dict(), cls=JSONEncoder) + '\n'
+    except NoKeyAPIError as e:
+        yield json.dumps({'error': str(e)}) + '\n'
+
+
+def wants_stream(request) -> bool:
+    return request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+class CacheStatsView(View):
+    """
+    Hit/miss counters and p50/p99 latency of every cache namespace, for staff
+    or in DEBUG.
+    """
+
+    def get(self, request):
+        if not (settings.DEBUG or request.user.is_staff):
+            return JsonResponse(
+                {'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN
+            )
+        return JsonResponse(metrics.get_stats())
 
 
 class ChannelView(views.APIView):
@@ -118,8 +167,59 @@ class ChannelView(views.APIView):
         if serializer.is_valid():
             channel_id = serializer.validated_data['channel_id']
 
+            # ?stream=1 sends videos as NDJSON while the crawl is still running
+            if wants_stream(request):
+                return StreamingHttpResponse(
+                    ndjson_lines(nokey_client.iter_video_details(channel_id)),
+                    content_type='application/x-ndjson',
+                )
+
             # use _search method to get the data
-            data = nokey_client._search(channel_id)
-            return Response(data, status=status.HTTP_200_OK)
+            data = channel_flight.do(
+                channel_id, lambda: nokey_client._search(channel_id)
+            )
+            return Response(render_videos(data), status=status.HTTP_200_OK)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncChannelView(View):
+    """
+    Async version of `ChannelView`, meant to be served by the ASGI application
+    (server/asgi.py) so a channel crawl does not hold a worker thread. Like
+    the DRF views it is an API endpoint and exempt from CSRF checks.
+    """
+
+    serializer_class = ChannelSerializers
+
+    async def get(self, request):
+        return JsonResponse({}, status=status.HTTP_200_OK)
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return JsonResponse(
+                {'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.serializer_class(data=payload)
+
+        if serializer.is_valid():
+            channel_id = serializer.validated_data['channel_id']
+
+            if wants_stream(request):
+                return StreamingHttpResponse(
+                    ndjson_alines(async_nokey_client.iter_video_details(channel_id)),
+                    content_type='application/x-ndjson',
+                )
+
+            data = await channel_flight.ado(
+                channel_id, lambda: async_nokey_client._search(channel_id)
+            )
+            return JsonResponse(
+                render_videos(data), safe=False, status=status.HTTP_200_OK
+            )
+        else:
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
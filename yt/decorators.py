@@ -5,6 +5,10 @@ from django.core.cache import cache
 from googleapiclient.errors import HttpError
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from server.metrics import metrics
+
+CACHE_METRICS_NAMESPACE = "youtube_api_client"
+
 
 class YouTubeAPIClientException(Exception):
     pass
@@ -21,13 +25,17 @@ def cached_api_call(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         cache_key = _get_cache_key(*args, **kwargs)
-        cached_response = cache.get(cache_key)
+        with metrics.timer(CACHE_METRICS_NAMESPACE):
+            cached_response = cache.get(cache_key)
 
         if cached_response is not None:
+            metrics.incr(CACHE_METRICS_NAMESPACE, "hits")
             return cached_response
 
+        metrics.incr(CACHE_METRICS_NAMESPACE, "misses")
         response = func(*args, **kwargs)
         cache.set(cache_key, response, youtube_api_client.cache_timeout)
+        metrics.incr(CACHE_METRICS_NAMESPACE, "sets")
         return response
 
     return wrapper
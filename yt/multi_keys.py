@@ -3,49 +3,35 @@ import os
 import random
 import time
 
-import requests
-from googleapiclient.cache import Cache
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from gclient.services import youtube_services
+from server.duration import parse_duration
+
 
 class YouTubeAPIClient:
     def __init__(
         self,
         api_keys,
-        cache_dir=None,
-        cache_expiry=3600,
         max_retries=3,
         backoff_factor=2,
     ):
         self.api_keys = api_keys
-        self.cache_dir = cache_dir
-        self.cache_expiry = cache_expiry
         self.max_retries = max_retries
         self.backoff_factor = backoff_factor
-        self.youtube = None
+        self.api_key = None
         self._init_client()
 
     def _init_client(self):
-        for api_key in self.api_keys:
-            try:
-                self.youtube = build('youtube', 'v3', developerKey=api_key)
-                self._setup_cache()
-                break
-            except HttpError as e:
-                print(f"An HTTP error occurred with key {api_key}: {e}")
-                continue
-
-        if not self.youtube:
+        # services are built on first use from the cached discovery doc, so
+        # choosing a key makes no request and cannot fail per key
+        if not self.api_keys:
             raise Exception("None of the API keys work.")
+        self.api_key = self.api_keys[0]
 
-    def _setup_cache(self):
-        if self.cache_dir:
-            cache = Cache(cache_dir=self.cache_dir, expires_sec=self.cache_expiry)
-            self.youtube._http = requests.Session()
-            self.youtube._http.mount(
-                'https://', requests.adapters.HTTPAdapter(cache=cache)
-            )
+    @property
+    def youtube(self):
+        return youtube_services.get(self.api_key)
 
     def _retry_request(self, func, *args, **kwargs):
         retries = 0
@@ -118,13 +104,5 @@ class YouTubeAPIClient:
     def _convert_duration(self, duration):
         # Convert duration from ISO 8601 format to a more readable format
         # Example: PT1H23M3S -> (1, 23, 3)
-        duration_parts = duration.split('PT')[-1].split('H')
-        hours = int(duration_parts[0]) if duration_parts[0] else 0
-        minutes = int(duration_parts[1].split('M')[0]) if len(duration_parts) > 1 else 0
-        seconds = (
-            int(duration_parts[1].split('S')[0])
-            if len(duration_parts) > 1
-            else int(duration_parts[0].split('M')[0])
-        )
-
-        return hours, minutes, seconds
+        parsed = parse_duration(duration)
+        return parsed.to_hms() if parsed is not None else (0, 0, 0)
@@ -1,6 +1,8 @@
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from server.duration import parse_duration
+
 
 class YouTubeAPIClient:
     def __init__(self, api_key):
@@ -60,13 +62,5 @@ class YouTubeAPIClient:
     def _convert_duration(self, duration):
         # Convert duration from ISO 8601 format to a more readable format
         # Example: PT1H23M3S -> (1, 23, 3)
-        duration_parts = duration.split('PT')[-1].split('H')
-        hours = int(duration_parts[0]) if duration_parts[0] else 0
-        minutes = int(duration_parts[1].split('M')[0]) if len(duration_parts) > 1 else 0
-        seconds = (
-            int(duration_parts[1].split('S')[0])
-            if len(duration_parts) > 1
-            else int(duration_parts[0].split('M')[0])
-        )
-
-        return hours, minutes, seconds
+        parsed = parse_duration(duration)
+        return parsed.to_hms() if parsed is not None else (0, 0, 0)
@@ -8,6 +8,8 @@ import requests
 from cachetools import TTLCache
 from tenacity import RetryError, retry, stop_after_attempts, wait_exponential
 
+from server.duration import parse_duration
+
 
 class YouTubeAPIClient:
     def __init__(
@@ -121,13 +123,5 @@ class YouTubeAPIClient:
     def _convert_duration(self, duration):
         # Convert duration from ISO 8601 format to a more readable format
         # Example: PT1H23M3S -> (1, 23, 3)
-        duration_parts = duration.split('PT')[-1].split('H')
-        hours = int(duration_parts[0]) if duration_parts[0] else 0
-        minutes = int(duration_parts[1].split('M')[0]) if len(duration_parts) > 1 else 0
-        seconds = (
-            int(duration_parts[1].split('S')[0])
-            if len(duration_parts) > 1
-            else int(duration_parts[0].split('M')[0])
-        )
-
-        return hours, minutes, seconds
+        parsed = parse_duration(duration)
+        return parsed.to_hms() if parsed is not None else (0, 0, 0)
@@ -4,6 +4,7 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from decorators import cached_api_call, retry_api_call
+from server.duration import parse_duration
 
 
 class YouTubeAPIClient:
@@ -84,16 +85,8 @@ class YouTubeAPIClient:
     def _convert_duration(self, duration: str) -> Tuple[int, int, int]:
         # Convert duration from ISO 8601 format to a more readable format
         # Example: PT1H23M3S -> (1, 23, 3)
-        duration_parts = duration.split('PT')[-1].split('H')
-        hours = int(duration_parts[0]) if duration_parts[0] else 0
-        minutes = int(duration_parts[1].split('M')[0]) if len(duration_parts) > 1 else 0
-        seconds = (
-            int(duration_parts[1].split('S')[0])
-            if len(duration_parts) > 1
-            else int(duration_parts[0].split('M')[0])
-        )
-
-        return hours, minutes, seconds
+        parsed = parse_duration(duration)
+        return parsed.to_hms() if parsed is not None else (0, 0, 0)
 
     def search_videos(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         return self._search_videos(query, max_results=max_results)